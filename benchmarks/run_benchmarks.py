@@ -0,0 +1,276 @@
+################################################################################
+#                                                                              #
+# Benchmarks of the game rules and the rendering of Tetris 2048                #
+#                                                                              #
+# Usage: python benchmarks/run_benchmarks.py [--output results.json]           #
+#                                                                              #
+################################################################################
+
+import os  # the os module is used for file and directory operations
+import sys  # used for finding the source code of the game
+import json  # used for saving the results as JSON
+import time  # used for timing the benchmarks
+import argparse  # used for parsing the command line arguments
+import platform  # used for recording the Python version with the results
+import subprocess  # used for recording the git commit with the results
+
+# the rendering benchmarks draw on a window that is never shown
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+# the modules of the game are imported from the src directory
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src")
+sys.path.insert(0, os.path.abspath(SRC_DIR))
+
+import numpy as np  # fundamental Python module for scientific computing
+from game_grid import GameGrid  # the class for modeling the game grid
+from tile_labeler import TileLabeler  # used for finding the free tiles
+from tetromino import Tetromino  # the class for modeling the tetrominoes
+from game_engine import create_tetromino  # used for creating the tetrominoes
+from piece_source import PieceSource  # used for seeding the tetrominoes
+import lib.stddraw as stddraw  # used for the rendering benchmarks
+from placement_search import PlacementSearch  # the search of the placements
+from cascade_resolver import CascadeResolver  # the resolver of the cascades
+
+# the sizes of the game grids as (grid_h, grid_w) and the densities (the ratio
+# of the occupied cells) of the synthetic boards used by the benchmarks
+SIZES = [(20, 12), (40, 24)]
+DENSITIES = [0.2, 0.5, 0.8]
+# the size of the game grid used by the rendering benchmarks (the size of the
+# canvas cannot be changed once the window is created)
+DISPLAY_SIZE = (20, 12)
+# the seed of the synthetic boards and the tetrominoes
+SEED = 2048
+
+# A function that returns a synthetic board with the given size where each
+# cell below the top 4 rows is occupied with the given probability (by a tile
+# from 2 to 64) and the given number of rows at the bottom are full
+def make_board(grid_h, grid_w, density, seed=SEED, full_rows=0):
+   rng = np.random.default_rng(seed)
+   board = rng.integers(1, 7, size=(grid_h, grid_w)).astype(np.uint8)
+   board[rng.random((grid_h, grid_w)) >= density] = 0
+   # leave room at the top for the tetrominoes
+   board[grid_h - 4:] = 0
+   for row in range(full_rows):
+      board[row][board[row] == 0] = 1
+   return board
+
+# A function that returns a game grid with the given board and a tetromino
+# (created from the given seed) entering it
+def make_grid(board, seed=SEED):
+   grid_h, grid_w = board.shape
+   Tetromino.grid_height, Tetromino.grid_width = grid_h, grid_w
+   source = PieceSource(seed)
+   grid = GameGrid(grid_h, grid_w)
+   set_board(grid, board)
+   grid.current_tetromino = create_tetromino(source)
+   grid.next_tetromino = create_tetromino(source)
+   return grid
+
+# A function for replacing the board of the given game grid with a copy of the
+# given board
+def set_board(grid, board):
+   grid.board[...] = board
+   grid._on_board_change()
+
+# A function that runs the given function (after calling setup before each
+# call, which is not timed) repeat times and returns the timings in seconds
+def measure(function, setup=None, repeat=200, warmup=5):
+   timings = []
+   for i in range(warmup + repeat):
+      if setup is not None:
+         setup()
+      start = time.perf_counter_ns()
+      function()
+      end = time.perf_counter_ns()
+      if i >= warmup:
+         timings.append((end - start) / 1e9)
+   return timings
+
+# A function that returns the result of a benchmark with the given name and
+# parameters from its timings
+def make_result(name, params, timings):
+   timings = np.array(timings)
+   return {"name": name, "params": params, "calls": len(timings),
+           "min_us": float(timings.min() * 1e6),
+           "median_us": float(np.median(timings) * 1e6),
+           "mean_us": float(timings.mean() * 1e6),
+           "p95_us": float(np.percentile(timings, 95) * 1e6)}
+
+# A function that returns the benchmarks of the game rules for a board with
+# the given size and density as (name, function, setup) tuples
+def rule_benchmarks(grid_h, grid_w, density):
+   board = make_board(grid_h, grid_w, density)
+   full_board = make_board(grid_h, grid_w, density, full_rows=3)
+   grid = make_grid(board)
+   tetromino = grid.current_tetromino
+   # the tetromino is placed at the top of the grid before each move
+   top = tetromino.bottom_left_cell.y
+
+   def reset():
+      set_board(grid, board)
+
+   def reset_full():
+      set_board(grid, full_board)
+
+   def reset_labeler():
+      set_board(grid, board)
+      # a new labeler does not know the tiles supported on the previous call,
+      # so the whole flood fill is timed
+      grid.labeler = TileLabeler(grid_h, grid_w)
+
+   def reset_tetromino():
+      set_board(grid, board)
+      # update_grid removes the tetromino from the grid
+      grid.current_tetromino = tetromino
+      tetromino.bottom_left_cell.y = top
+
+   # the tiles and the landing position of the tetromino for update_grid
+   tetromino.drop(grid)
+   tiles, position = tetromino.get_min_bounded_tile_matrix(True)
+   reset_tetromino()
+
+   def can_be_moved():
+      tetromino.can_be_moved("left", grid)
+      tetromino.can_be_moved("right", grid)
+      tetromino.can_be_moved("down", grid)
+
+   def rotate():
+      tetromino.rotate_clockwise(grid)
+      tetromino.rotate_counter_clockwise(grid)
+
+   # the resolver resolves the cascade on each call when its cache is cleared
+   # and finds it in the cache otherwise
+   resolver = CascadeResolver(grid_h, grid_w)
+
+   def reset_resolver():
+      resolver.cache.clear()
+
+   # the search starts with empty caches on each call (as for a new board)
+   # and finds the boards and the cascades in them on the next call
+   searcher = PlacementSearch(grid_h, grid_w)
+   searcher.resolver = CascadeResolver(grid_h, grid_w)
+
+   def reset_search():
+      reset_tetromino()
+      searcher.table.clear()
+      searcher.resolver.cache.clear()
+
+   return [
+      ("merge_tiles", grid.merge_tiles, reset),
+      ("clear_full_rows", grid.clear_full_rows, reset_full),
+      ("handle_free_tiles", grid.handle_free_tiles, reset_labeler),
+      ("update_grid", lambda: grid.update_grid(tiles, position), reset),
+      ("can_be_moved", can_be_moved, reset_tetromino),
+      ("rotate", rotate, reset_tetromino),
+      ("hard_drop", lambda: tetromino.drop(grid), reset_tetromino),
+      ("resolve_cascade", lambda: resolver.resolve(full_board), reset_resolver),
+      ("resolve_cascade_cached", lambda: resolver.resolve(full_board), None),
+      ("placement_search", lambda: searcher.search(grid), reset_search),
+      ("placement_search_cached", lambda: searcher.search(grid),
+       reset_tetromino),
+   ]
+
+# A function that creates the (hidden) window used by the rendering benchmarks
+def create_canvas():
+   grid_h, grid_w = DISPLAY_SIZE
+   stddraw.setCanvasSize(40 * grid_w + 40 * grid_w / 3, 40 * grid_h)
+   stddraw.setXscale(-0.5, grid_w + grid_w / 3 - 0.5)
+   stddraw.setYscale(-0.5, grid_h - 0.5)
+
+# A function that returns the rendering benchmarks for a board with the given
+# density as (name, function, setup) tuples: drawing whole frames and drawing
+# only the changes after moving the current tetromino
+def display_benchmarks(density):
+   grid_h, grid_w = DISPLAY_SIZE
+   board = make_board(grid_h, grid_w, density)
+   full_grid = make_grid(board)
+   incremental_grid = make_grid(board)
+   incremental_grid.incremental_render = True
+   tetromino = incremental_grid.current_tetromino
+   left = tetromino.bottom_left_cell.x
+
+   def move():
+      # the tetromino is moved back and forth between two columns
+      direction = "right" if tetromino.bottom_left_cell.x == left else "left"
+      tetromino.move(direction, incremental_grid)
+
+   def start_incremental():
+      # start from a whole frame drawn by the grid itself
+      stddraw.clear()
+      incremental_grid.display(0)
+
+   benchmarks = [
+      ("display", lambda: full_grid.display(0), None),
+      ("display_incremental", lambda: incremental_grid.display(0), move),
+   ]
+   return benchmarks, start_incremental
+
+# A function that runs all the benchmarks whose names contain the given filter
+# and returns their results
+def run(repeat, name_filter=""):
+   results = []
+   for grid_h, grid_w in SIZES:
+      for density in DENSITIES:
+         params = {"grid_h": grid_h, "grid_w": grid_w, "density": density}
+         for name, function, setup in rule_benchmarks(grid_h, grid_w, density):
+            if name_filter in name:
+               timings = measure(function, setup, repeat)
+               results.append(make_result(name, params, timings))
+   if any(name_filter in name for name in ("display", "display_incremental")):
+      create_canvas()
+      grid_h, grid_w = DISPLAY_SIZE
+      for density in DENSITIES:
+         params = {"grid_h": grid_h, "grid_w": grid_w, "density": density}
+         benchmarks, start = display_benchmarks(density)
+         for name, function, setup in benchmarks:
+            if name_filter in name:
+               start()
+               timings = measure(function, setup, repeat)
+               results.append(make_result(name, params, timings))
+   return results
+
+# A function that returns the git commit of the source code (None when it is
+# not in a git repository)
+def get_commit():
+   try:
+      output = subprocess.run(["git", "rev-parse", "HEAD"], cwd=SRC_DIR,
+                              capture_output=True, text=True, check=True)
+   except (OSError, subprocess.CalledProcessError):
+      return None
+   return output.stdout.strip()
+
+# The main function where this program starts execution
+def main():
+   parser = argparse.ArgumentParser(description="Benchmark the game rules "
+                                    "and the rendering of Tetris 2048.")
+   parser.add_argument("--output", help="the JSON file the results are "
+                       "written to (printed when not given)")
+   parser.add_argument("--repeat", type=int, default=200,
+                       help="the number of timed calls of each benchmark")
+   parser.add_argument("--filter", default="",
+                       help="run only the benchmarks whose names contain this")
+   args = parser.parse_args()
+
+   results = run(args.repeat, args.filter)
+   report = {"commit": get_commit(),
+             "python": platform.python_version(),
+             "numpy": np.__version__,
+             "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+             "repeat": args.repeat,
+             "results": results}
+   text = json.dumps(report, indent=2)
+   if args.output:
+      with open(args.output, "w") as f:
+         f.write(text + "\n")
+   else:
+      print(text)
+   # a summary for reading the results on the terminal
+   for result in results:
+      params = result["params"]
+      print("%-24s %3dx%-3d density=%.1f  median %9.1f us" % (
+         result["name"], params["grid_h"], params["grid_w"],
+         params["density"], result["median_us"]), file=sys.stderr)
+
+if __name__ == "__main__":
+   main()
@@ -0,0 +1,163 @@
+from board_kernels import merge_columns, remove_full_rows, remove_free_tiles
+from tetromino import ROTATION_STATES  # the rotation states of the shapes
+from piece_source import TETROMINO_TYPES  # the types of the tetrominoes
+import numpy as np  # fundamental Python module for scientific computing
+
+# the vertical offsets from the bottom row of the tile matrix (dy) and the
+# column indexes (dx) of the 4 tiles of each tetromino type (by its index in
+# TETROMINO_TYPES) in each rotation state, in the tile order of the rotation
+# states, as arrays with the shape (7, 4, 4)
+_TILE_DY = np.array([[[state.n - 1 - row for row, col in state.cells]
+                      for state in ROTATION_STATES[shape]]
+                     for shape in TETROMINO_TYPES])
+_TILE_DX = np.array([[[col for row, col in state.cells]
+                      for state in ROTATION_STATES[shape]]
+                     for shape in TETROMINO_TYPES])
+
+# A class for modeling a batch of game grids that are played in lockstep. The
+# boards of all the game grids are stored in one (N, H, W) array of the log2
+# exponents of the tile numbers (0 for the empty cells, as in GameGrid), and
+# the tetrominoes are placed and the game rules are applied on all the boards
+# with vectorized passes instead of one GameGrid per board. The score, the game
+# over flag and the statistics of each board are stored in arrays of length N.
+class BatchGameGrid:
+   # A constructor for creating the given number of empty game grids with the
+   # given dimensions
+   def __init__(self, n_boards, grid_h=20, grid_w=12):
+      self.n_boards = n_boards
+      self.grid_height = grid_h
+      self.grid_width = grid_w
+      self.reset()
+
+   # A method for emptying all the game grids and resetting their scores, game
+   # over flags and statistics
+   def reset(self):
+      shape = (self.n_boards, self.grid_height, self.grid_width)
+      self.boards = np.zeros(shape, dtype=np.uint8)
+      self.scores = np.zeros(self.n_boards, dtype=np.int64)
+      self.game_over = np.zeros(self.n_boards, dtype=bool)
+      # the number of the tetrominoes placed, the full rows cleared and the
+      # cells holding the merged tiles after each merge on each board
+      self.pieces_placed = np.zeros(self.n_boards, dtype=np.int64)
+      self.lines_cleared = np.zeros(self.n_boards, dtype=np.int64)
+      self.merges = np.zeros(self.n_boards, dtype=np.int64)
+
+   # A method that returns the height of each column of each board (the index
+   # of the row above its topmost tile) as an (N, W) array
+   def get_column_heights(self):
+      occupied = self.boards != 0
+      # the index of the topmost tile counted from the top row
+      from_top = np.argmax(occupied[:, ::-1, :], axis=1)
+      return np.where(occupied.any(axis=1), self.grid_height - from_top, 0)
+
+   # A method that returns the rows and the columns of the tiles (N, 4) of the
+   # tetrominoes with the given types (indexes in TETROMINO_TYPES), rotation
+   # states and horizontal positions of their bottom left cells (N) when they
+   # are dropped from above the game grids as far down as possible
+   def get_landing_cells(self, types, rotations, xs):
+      dy = _TILE_DY[types, rotations]
+      cols = _TILE_DX[types, rotations] + np.asarray(xs)[:, None]
+      if (cols < 0).any() or (cols >= self.grid_width).any():
+         raise ValueError('tetromino outside the game grid')
+      # the lowest position where every tile is above the topmost tile of its
+      # column
+      heights = np.take_along_axis(self.get_column_heights(), cols, axis=1)
+      y = (heights - dy).max(axis=1)
+      return y[:, None] + dy, cols
+
+   # A method for locking the tiles with the given rows, columns and exponents
+   # (N, 4) on the boards that are not over; a board is over when any of its
+   # tiles is above the game grid (as in GameGrid.update_grid)
+   def lock_tiles(self, rows, cols, exponents):
+      active = ~self.game_over
+      inside = (rows < self.grid_height) & active[:, None]
+      boards = np.broadcast_to(np.arange(self.n_boards)[:, None], rows.shape)
+      self.boards[boards[inside], rows[inside], cols[inside]] = exponents[inside]
+      self.game_over |= active & (rows >= self.grid_height).any(axis=1)
+      self.pieces_placed += active
+
+   # A method for dropping the tetrominoes with the given types, rotation
+   # states, horizontal positions and tile numbers (N, 4, in the tile order of
+   # the rotation states) on the game grids, locking them and resolving the
+   # cascades (returns the number of cascade steps on each board)
+   def place(self, types, rotations, xs, numbers):
+      rows, cols = self.get_landing_cells(types, rotations, xs)
+      exponents = np.log2(np.asarray(numbers)).astype(np.uint8)
+      self.lock_tiles(rows, cols, exponents)
+      return self.resolve_cascade()
+
+   # A method for merging the tiles on the boards given by the active mask (all
+   # the boards when it is None); returns a mask of the changed boards
+   def merge_tiles(self, active=None):
+      indexes, boards = self._select(active)
+      gained, merged = merge_columns(boards)
+      self.boards[indexes] = boards
+      self.scores[indexes] += gained
+      self.merges[indexes] += merged.sum(axis=(1, 2))
+      return self._changed(indexes, gained > 0)
+
+   # A method for clearing the full rows on the boards given by the active mask
+   # (all the boards when it is None); returns a mask of the changed boards
+   def clear_full_rows(self, active=None):
+      indexes, boards = self._select(active)
+      full = remove_full_rows(boards)
+      self.boards[indexes] = boards
+      n_full = full.sum(axis=1)
+      self.lines_cleared[indexes] += n_full
+      return self._changed(indexes, n_full > 0)
+
+   # A method for removing the free tiles on the boards given by the active
+   # mask (all the boards when it is None); returns a mask of the changed boards
+   def handle_free_tiles(self, active=None):
+      indexes, boards = self._select(active)
+      gained, freed = remove_free_tiles(boards)
+      self.boards[indexes] = boards
+      self.scores[indexes] += gained
+      return self._changed(indexes, freed.any(axis=(1, 2)))
+
+   # A method that repeats merging the tiles, clearing the full rows and
+   # removing the free tiles on each board until none of them changes it, in
+   # the same order as GameEngine.resolve_cascade: on each step, a board is
+   # changed by only the first of them that changes it. The boards that are
+   # still changing are stepped together. Returns the number of steps of each
+   # board.
+   def resolve_cascade(self):
+      steps = np.zeros(self.n_boards, dtype=np.int64)
+      active = ~self.game_over
+      while active.any():
+         changed = self.merge_tiles(active)
+         rest = active & ~changed
+         if rest.any():
+            changed |= self.clear_full_rows(rest)
+            rest &= ~changed
+         if rest.any():
+            changed |= self.handle_free_tiles(rest)
+         steps += changed
+         active = changed
+      return steps
+
+   # A method that returns the indexes of the boards given by the active mask
+   # (all the boards when it is None) and a copy of these boards
+   def _select(self, active):
+      if active is None:
+         indexes = np.arange(self.n_boards)
+      else:
+         indexes = np.flatnonzero(active)
+      return indexes, self.boards[indexes]
+
+   # A method that returns a mask of all the boards from the changed values of
+   # the boards with the given indexes
+   def _changed(self, indexes, changed):
+      mask = np.zeros(self.n_boards, dtype=bool)
+      mask[indexes] = changed
+      return mask
+
+# A function that returns the types (indexes in TETROMINO_TYPES), the rotation
+# states, the horizontal positions and the tile numbers of the given tetrominoes
+# as the arrays used by BatchGameGrid.place
+def tetromino_arrays(tetrominoes):
+   types = np.array([TETROMINO_TYPES.index(t.type) for t in tetrominoes])
+   rotations = np.array([t.rotation for t in tetrominoes])
+   xs = np.array([t.bottom_left_cell.x for t in tetrominoes])
+   numbers = np.array([[tile.number for tile in t.tiles] for t in tetrominoes])
+   return types, rotations, xs, numbers
@@ -0,0 +1,170 @@
+import numpy as np  # fundamental Python module for scientific computing
+
+# Vectorized implementations of the game rules that work on boards storing the
+# log2 exponents of the tile numbers (0 is used for the empty cells). A board
+# is an array whose last two axes are the rows (row 0 is the bottom row) and
+# the columns of the game grid, so that a stack of boards with the shape
+# (..., H, W) is processed by the same calls as a single (H, W) board.
+
+# the numbers on the merged tiles by the exponents of the tiles they merge
+_MERGED_NUMBERS = np.left_shift(2, np.arange(256, dtype=np.int64))
+
+# A function that merges the equal tiles stacked on top of each other in all
+# the columns of the given board (in place). Each column is scanned from the
+# bottom upwards and the current tile absorbs the tile above it as long as
+# they have the same number, after which the rest of the column (including
+# the empty cells) is moved down by one. Only the columns that have a pair of
+# equal tiles on top of each other are scanned: the columns of a single board
+# one by one as Python lists (which is faster than the NumPy calls for the few
+# cells of a game grid) and the columns of a stack of boards all at once.
+# Returns the score gained on each board and a mask of the merged cells.
+def merge_columns(board):
+   # the pairs of vertically adjacent tiles with the same number
+   lower, upper = board[..., :-1, :], board[..., 1:, :]
+   pairs = (lower == upper) & (lower != 0)
+   if board.ndim == 2:
+      return _merge_board(board, pairs)
+   gained = np.zeros(board.shape[:-2], dtype=np.int64)
+   merged = np.zeros(board.shape, dtype=bool)
+   # the columns of all the boards that have any pair (..., W)
+   has_pair = pairs.any(axis=-2)
+   if not has_pair.any():
+      return gained, merged
+   # the columns with a pair are merged as the columns of an (H, K) array
+   columns = np.moveaxis(board, -1, -2)
+   result, merged_cells, score = _merge_column_stack(
+      columns[has_pair].T, np.moveaxis(pairs, -1, -2)[has_pair].T)
+   columns[has_pair] = result.T
+   np.moveaxis(merged, -1, -2)[has_pair] = merged_cells.T
+   column_score = np.zeros(has_pair.shape, dtype=np.int64)
+   column_score[has_pair] = score
+   gained += column_score.sum(axis=-1)
+   return gained, merged
+
+# A function that merges the columns of the given single board (H, W) that
+# have any of the given pairs (H - 1, W), see merge_columns
+def _merge_board(board, pairs):
+   gained = 0
+   merged = np.zeros(board.shape, dtype=bool)
+   pair_columns = np.flatnonzero(pairs.any(axis=0)).tolist()
+   if not pair_columns:
+      return gained, merged
+   grid_h = board.shape[0]
+   for col, column in zip(pair_columns, board[:, pair_columns].T.tolist()):
+      result, merged_rows = [], []
+      current, current_merged = column[0], False
+      for above in column[1:]:
+         if above == current and current:
+            gained += 2 << current  # the number on the merged tile
+            current += 1
+            current_merged = True
+         else:
+            if current_merged:
+               merged_rows.append(len(result))
+            result.append(current)
+            current, current_merged = above, False
+      if current_merged:
+         merged_rows.append(len(result))
+      result.append(current)
+      board[:, col] = result + [0] * (grid_h - len(result))
+      merged[merged_rows, col] = True
+   return gained, merged
+
+# A function that merges the given columns (stored as the columns of an (H, K)
+# array) with the given pairs (H - 1, K) all at once, scanning the rows from
+# the lowest pair upwards until no tile can absorb the tile above it any more
+# (after the highest pair, only a tile that has just absorbed another one can
+# do it). Returns the merged columns (H, K), a mask of the merged cells and the
+# score gained on each column.
+def _merge_column_stack(columns, pairs):
+   H, K = columns.shape
+   pair_rows = np.flatnonzero(pairs.any(axis=1))
+   first_row, last_row = int(pair_rows[0]), int(pair_rows[-1])
+   result = columns.copy()
+   merged = np.zeros(columns.shape, dtype=bool)
+   # the flat views of the results written through the flat indexes of the
+   # cells of each column
+   result_cells, merged_cells = result.reshape(-1), merged.reshape(-1)
+   indexes = np.arange(K)
+   # the current tile of each column, the cell it is written to and the
+   # columns whose current tiles have absorbed any tile (each tile is written
+   # to its cell on every step and the cell is moved up only when the tile
+   # cannot absorb the next one, so a merged tile is written last to its cell)
+   current = columns[first_row].copy()
+   write_offset = indexes.copy()  # the write cell minus (row - 1) * K
+   current_merged = indexes[:0]
+   score = np.zeros(K, dtype=np.int64)
+   row = first_row + 1
+   while row < H:
+      above = columns[row]
+      absorbs = (current == above) & (current != 0)
+      absorbing = np.flatnonzero(absorbs)
+      if row > last_row + 1 and len(absorbing) == 0:
+         break
+      write_cell = write_offset + (row - 1) * K
+      result_cells[write_cell] = current
+      merged_cells[write_cell[current_merged]] = True
+      # the cells of the absorbing tiles are not moved up
+      write_offset[absorbing] -= K
+      score[absorbing] += _MERGED_NUMBERS[current[absorbing]]
+      next_current = above.copy()
+      next_current[absorbing] = current[absorbing] + 1
+      current, current_merged = next_current, absorbing
+      row += 1
+   write_cell = write_offset + (row - 1) * K
+   result_cells[write_cell] = current
+   merged_cells[write_cell[current_merged]] = True
+   # the rows from row upwards are moved down by the number of the tiles
+   # absorbed in each column (emptying the cells left at the top)
+   shift = (row - 1) - (write_cell // K)
+   for n in np.unique(shift[shift > 0]).tolist():
+      shifted = shift == n
+      result[row - n:H - n, shifted] = columns[row:, shifted]
+      result[H - n:, shifted] = 0
+   return result, merged, score
+
+# A function that removes the full rows of the given board (in place) by
+# moving all the other rows down in one gather and emptying the rows left at
+# the top. Returns a mask (..., H) of the rows that were full.
+def remove_full_rows(board):
+   full = (board != 0).all(axis=-1)
+   if not full.any():
+      return full
+   H = board.shape[-2]
+   # a stable sort puts the remaining rows first in their original order
+   order = np.argsort(full, axis=-1, kind='stable')
+   board[...] = np.take_along_axis(board, order[..., None], axis=-2)
+   # the number of full rows is the number of rows to empty at the top
+   n_full = full.sum(axis=-1)
+   board[np.arange(H) >= (H - n_full)[..., None]] = 0
+   return full
+
+# A function that removes the free tiles (the tiles that are not connected to
+# the bottom row through their left, right, upper and lower neighbors) from the
+# given board (in place). The tiles connected to the bottom row are found by
+# growing the tiles reached from the bottom row by one cell in each direction
+# (within the occupied cells) until no more tiles are reached, on all the
+# boards at the same time. Returns the sum of the removed tile numbers on each
+# board and a mask of the cells the tiles are removed from.
+def remove_free_tiles(board):
+   occupied = board != 0
+   reached = np.zeros(board.shape, dtype=bool)
+   reached[..., 0, :] = occupied[..., 0, :]
+   count = np.count_nonzero(reached)
+   while True:
+      grown = reached.copy()
+      grown[..., 1:, :] |= reached[..., :-1, :]
+      grown[..., :-1, :] |= reached[..., 1:, :]
+      grown[..., :, 1:] |= reached[..., :, :-1]
+      grown[..., :, :-1] |= reached[..., :, 1:]
+      grown &= occupied
+      # the reached tiles only grow, so nothing changed when their count did not
+      grown_count = np.count_nonzero(grown)
+      if grown_count == count:
+         break
+      reached, count = grown, grown_count
+   free = occupied & ~reached
+   numbers = np.where(free, np.left_shift(1, board.astype(np.int64)), 0)
+   gained = numbers.sum(axis=(-2, -1))
+   board[free] = 0
+   return gained, free
@@ -0,0 +1,98 @@
+from board_kernels import merge_columns, remove_full_rows  # the game rules
+from tile_labeler import TileLabeler  # used for finding the free tiles
+from zobrist import get_zobrist_table  # used for hashing the boards
+import collections  # used for the cache and the results
+
+# the maximum number of cascades kept in the cache of a resolver
+CACHE_SIZE = 4096
+
+# A step of a cascade: its kind ('merge', 'clear' or 'free'), the board after
+# it (read-only), the score gained, the number of the cells holding the merged
+# tiles and the number of the full rows cleared
+CascadeStep = collections.namedtuple(
+   'CascadeStep', ['kind', 'board', 'gained', 'merges', 'lines'])
+# A resolved cascade: the final board (read-only) and its hash, the total score
+# gained, the steps in order and the total numbers of merges and cleared rows
+Cascade = collections.namedtuple(
+   'Cascade', ['board', 'board_hash', 'gained', 'steps', 'merges', 'lines'])
+
+# A class for resolving the cascade started by locking a tetromino on a board:
+# merging the tiles, clearing the full rows and removing the free tiles (the
+# first of them that changes the board on each step, as in GameEngine) until
+# none of them changes it. The cascades are resolved on copies of the boards
+# and the most recently resolved ones are kept in a cache (evicting the least
+# recently used ones) by the Zobrist hashes of the boards they start from (see
+# zobrist.py), since the board after the lock determines the whole cascade.
+# The boards are compared on each hit, so a hash collision is never used.
+class CascadeResolver:
+   # A constructor for creating a resolver for the boards with the given
+   # dimensions that keeps up to cache_size cascades
+   def __init__(self, grid_h, grid_w, cache_size=CACHE_SIZE):
+      self.cache_size = cache_size
+      self.zobrist = get_zobrist_table(grid_h, grid_w)
+      self.labeler = TileLabeler(grid_h, grid_w)
+      # the starting boards (as bytes) and the cascades by the hashes of the
+      # starting boards, and the numbers of the found and the missing cascades
+      # and of the hash collisions
+      self.cache = collections.OrderedDict()
+      self.hits, self.misses, self.collisions = 0, 0, 0
+
+   # A method that returns the cascade starting from the given board with the
+   # given hash (computed when it is not given) from the cache, resolving it
+   # when it is missing (the given board is not changed)
+   def resolve(self, board, board_hash=None):
+      if board_hash is None:
+         board_hash = self.zobrist.hash(board)
+      key = board.tobytes()
+      entry = self.cache.get(board_hash)
+      if entry is not None:
+         if entry[0] == key:
+            self.cache.move_to_end(board_hash)
+            self.hits += 1
+            return entry[1]
+         self.collisions += 1
+      self.misses += 1
+      cascade = self._resolve(board, board_hash)
+      self.cache[board_hash] = (key, cascade)
+      self.cache.move_to_end(board_hash)
+      if len(self.cache) > self.cache_size:
+         self.cache.popitem(last=False)
+      return cascade
+
+   # A method that resolves the cascade starting from the given board with the
+   # given hash
+   def _resolve(self, board, board_hash):
+      final = board.copy()
+      steps = []
+      while True:
+         # 1) merges, 2) line clears and 3) floating tiles, in this order
+         gained, merged = merge_columns(final)
+         if gained:
+            step = CascadeStep('merge', final.copy(), int(gained),
+                               int(merged.sum()), 0)
+         else:
+            n_full = int(remove_full_rows(final).sum())
+            if n_full:
+               step = CascadeStep('clear', final.copy(), 0, 0, n_full)
+            else:
+               gained, _ = self.labeler.remove_free_tiles(final)
+               if not gained:
+                  break
+               step = CascadeStep('free', final.copy(), int(gained), 0, 0)
+         step.board.flags.writeable = False
+         steps.append(step)
+      final.flags.writeable = False
+      return Cascade(final, self.zobrist.update(board_hash, board, final),
+                     sum(step.gained for step in steps), tuple(steps),
+                     sum(step.merges for step in steps),
+                     sum(step.lines for step in steps))
+
+# the resolvers shared by all the games with the same dimensions
+_resolvers = {}
+
+# A function that returns the resolver shared by the boards with the given
+# dimensions
+def get_cascade_resolver(grid_h, grid_w):
+   if (grid_h, grid_w) not in _resolvers:
+      _resolvers[grid_h, grid_w] = CascadeResolver(grid_h, grid_w)
+   return _resolvers[grid_h, grid_w]
@@ -0,0 +1,75 @@
+import time  # used for the monotonic clock and for sleeping
+
+# A class for scheduling the periodic tasks of the game loop (such as the
+# gravity ticks, the input polling and the rendering) on a monotonic clock.
+# Each task has its own period, and the game loop asks which tasks are due and
+# sleeps until the next one instead of pausing for a fixed time after every
+# frame, so that e.g. the keys are handled within a few milliseconds however
+# slowly the tetrominoes fall. Only the tasks the game loop asked about (or
+# scheduled) since it last waited are waited for, so a task it is not polling
+# (e.g. the gravity while a cascade is animated) cannot keep it from sleeping.
+class FrameScheduler:
+   # A constructor for creating a scheduler without any tasks (the clock and
+   # the sleep function can be given for running it without real time)
+   def __init__(self, clock=time.monotonic, sleep=time.sleep):
+      self.clock = clock
+      self.sleep = sleep
+      # the period and the next due time of each task (in seconds)
+      self.periods = {}
+      self.deadlines = {}
+      # the tasks asked about or scheduled since the last wait
+      self.polled = set()
+
+   # A method for (re)starting the task with the given name and period in
+   # milliseconds; the task is first due after delay milliseconds (after one
+   # period when delay is not given)
+   def schedule(self, name, msec, delay=None):
+      self.periods[name] = msec / 1000.0
+      if delay is None:
+         delay = msec
+      self.deadlines[name] = self.clock() + delay / 1000.0
+      self.polled.add(name)
+
+   # A method for stopping the task with the given name
+   def cancel(self, name):
+      self.periods.pop(name, None)
+      self.deadlines.pop(name, None)
+
+   # A method for restarting all the tasks (e.g. after a menu is displayed) so
+   # that each of them is due after one period from now
+   def restart(self):
+      now = self.clock()
+      for name, period in self.periods.items():
+         self.deadlines[name] = now + period
+
+   # A method that returns True when the task with the given name is due and
+   # moves its due time to the next period. The periods missed when the game
+   # loop falls behind by more than one period are skipped instead of being
+   # run one after another.
+   def due(self, name):
+      deadline = self.deadlines.get(name)
+      if deadline is None:
+         return False
+      self.polled.add(name)
+      now = self.clock()
+      if now < deadline:
+         return False
+      deadline += self.periods[name]
+      if deadline <= now:
+         deadline = now + self.periods[name]
+      self.deadlines[name] = deadline
+      return True
+
+   # A method for sleeping until the next task asked about (or scheduled)
+   # since the last wait is due (until the next task when there is none)
+   def wait(self):
+      deadlines = [self.deadlines[name] for name in self.polled
+                   if name in self.deadlines]
+      self.polled.clear()
+      if not deadlines:
+         deadlines = list(self.deadlines.values())
+      if not deadlines:
+         return
+      remaining = min(deadlines) - self.clock()
+      if remaining > 0:
+         self.sleep(remaining)
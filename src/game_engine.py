@@ -0,0 +1,188 @@
+from game_grid import GameGrid  # the class for modeling the game grid
+from tetromino import Tetromino  # the class for modeling the tetrominoes
+# the source of the random values and the types (shapes) of the tetrominoes
+from piece_source import PieceSource, TETROMINO_TYPES, get_default_source
+from tile import exponent_to_number  # used for the largest tile number
+# used for finding the placements of the tetrominoes
+from placement_search import get_reachable_placements, get_placement_height
+from cascade_resolver import get_cascade_resolver  # used for the cascades
+
+# the actions that can be applied to the current tetromino by the engine
+ACTIONS = ('left', 'right', 'down', 'rotate_clockwise',
+           'rotate_counter_clockwise', 'hard_drop')
+
+# A function for creating random shaped tetrominoes to enter the game grid
+# (with the random values drawn from the given piece source)
+def create_tetromino(source=None):
+   if source is None:
+      source = get_default_source()
+   # the type (shape) of the tetromino is determined randomly
+   random_type = source.next_type()
+   # create and return the tetromino
+   tetromino = Tetromino(random_type, source)
+   return tetromino
+
+# A class for running the rules of the game without any rendering, user input
+# or sound (the game loop in main.py and the simulations are built on it)
+class GameEngine:
+   # A constructor for creating a headless game with the given grid dimensions,
+   # whose random values are drawn from the given piece source or from a new
+   # one created with the given seed and bag option (see piece_source.py)
+   def __init__(self, grid_h=20, grid_w=12, seed=None, bag=False, source=None):
+      # set the game grid dimension values stored and used in the Tetromino class
+      Tetromino.grid_height = grid_h
+      Tetromino.grid_width = grid_w
+      if source is None:
+         source = PieceSource(seed, bag)
+      self.source = source
+      # create the game grid whose rules are applied by this engine
+      self.grid = GameGrid(grid_h, grid_w)
+      # the resolver of the cascades (shared with the other games and the
+      # searches on the game grids with the same dimensions)
+      self.resolver = get_cascade_resolver(grid_h, grid_w)
+      # create the current and the next tetromino
+      self.reset()
+
+   # A method for starting a new game on an empty game grid (with a new piece
+   # source created with the given seed when it is given, so that the game can
+   # be replayed)
+   def reset(self, seed=None):
+      if seed is not None:
+         self.source = PieceSource(seed, self.source.bag)
+      self.grid.reset_scene()
+      # the statistics of the game: the number of the tetrominoes locked, the
+      # full rows cleared and the cells holding the merged tiles after each merge
+      self.pieces_placed = 0
+      self.lines_cleared = 0
+      self.merges = 0
+      self.grid.current_tetromino = create_tetromino(self.source)
+      self.grid.next_tetromino = create_tetromino(self.source)
+
+   # A method for moving the current tetromino in a given direction by 1
+   def move(self, direction):
+      return self.grid.current_tetromino.move(direction, self.grid)
+
+   # A method for rotating the current tetromino clockwise by 90 degrees
+   def rotate_clockwise(self):
+      return self.grid.current_tetromino.rotate_clockwise(self.grid)
+
+   # A method for rotating the current tetromino counter-clockwise by 90 degrees
+   def rotate_counter_clockwise(self):
+      return self.grid.current_tetromino.rotate_counter_clockwise(self.grid)
+
+   # A method for dropping the current tetromino as far down as possible
+   # (returns the number of rows the tetromino is moved down)
+   def hard_drop(self):
+      return self.grid.current_tetromino.drop(self.grid)
+
+   # A method for applying one of the ACTIONS to the current tetromino
+   def apply(self, action):
+      if action in ('left', 'right', 'down'):
+         return self.move(action)
+      if action == 'rotate_clockwise':
+         return self.rotate_clockwise()
+      if action == 'rotate_counter_clockwise':
+         return self.rotate_counter_clockwise()
+      if action == 'hard_drop':
+         return self.hard_drop() > 0
+      raise ValueError('unknown action: ' + str(action))
+
+   # A method that locks the current tetromino on the game grid
+   # (returns True when the game is over and False otherwise)
+   def lock(self):
+      tiles, pos = self.grid.current_tetromino.get_min_bounded_tile_matrix(True)
+      self.pieces_placed += 1
+      return self.grid.update_grid(tiles, pos)
+
+   # A method that returns the cascade of merging the tiles, clearing the full
+   # rows and removing the free tiles started by the tiles locked on the game
+   # grid (see cascade_resolver.py) without changing the game grid
+   def get_cascade(self):
+      return self.resolver.resolve(self.grid.board, self.grid.board_hash)
+
+   # A method that applies the given step of a cascade (see get_cascade) to
+   # the game grid
+   def apply_cascade_step(self, step):
+      self.grid.set_board(step.board)
+      self.grid.score += step.gained
+      self.merges += step.merges
+      self.lines_cleared += step.lines
+
+   # A method that resolves the cascade started by the tiles locked on the
+   # game grid (on_step is called with the game grid after each step of the
+   # cascade, e.g. to animate it, and the number of the steps is returned)
+   def resolve_cascade(self, on_step=None):
+      cascade = self.get_cascade()
+      if on_step is None:
+         # only the final board is needed
+         self.grid.set_board(cascade.board)
+         self.grid.score += cascade.gained
+         self.merges += cascade.merges
+         self.lines_cleared += cascade.lines
+      else:
+         for step in cascade.steps:
+            self.apply_cascade_step(step)
+            on_step(self.grid)
+      return len(cascade.steps)
+
+   # A method for making the next tetromino the current one and creating a
+   # new next tetromino
+   def spawn(self):
+      self.grid.current_tetromino = self.grid.next_tetromino
+      self.grid.next_tetromino = create_tetromino(self.source)
+
+   # A method that returns the placements of the current tetromino as
+   # (rotation, x) pairs, i.e., the rotation states and the horizontal
+   # positions of its bottom left cell that it can be moved and rotated to
+   # (after falling far enough to be rotated, see get_placement_height)
+   def get_placements(self):
+      return get_reachable_placements(self.grid)
+
+   # A method for moving the current tetromino to the given rotation state and
+   # the given horizontal position of its bottom left cell, which must be one
+   # of the placements returned by get_placements (the tetromino is moved down
+   # to the height the placements are reached at)
+   def move_to(self, rotation, x):
+      if (rotation, x) not in self.get_placements():
+         raise ValueError('invalid placement: ' + str((rotation, x)))
+      tetromino = self.grid.current_tetromino
+      tetromino.bottom_left_cell.y = get_placement_height(self.grid, tetromino)
+      tetromino.rotation = rotation
+      tetromino.bottom_left_cell.x = x
+
+   # A method for moving the current tetromino to the given placement (see
+   # move_to) and dropping it, after which it is locked, the cascade is
+   # resolved and the next tetromino is spawned (returns False when the game
+   # is over and True otherwise)
+   def place(self, rotation, x):
+      self.move_to(rotation, x)
+      self.hard_drop()
+      if self.lock():
+         return False
+      self.resolve_cascade()
+      self.spawn()
+      return True
+
+   # A method that returns the number on the largest tile on the game grid
+   # (0 when the game grid is empty)
+   def get_max_tile(self):
+      exponent = int(self.grid.board.max())
+      return exponent_to_number(exponent) if exponent else 0
+
+   # A method for advancing the game by one gravity tick after applying the
+   # given action (if any) to the current tetromino; the tetromino is locked,
+   # the cascade is resolved and the next tetromino is spawned when it cannot
+   # be moved down (returns False when the game is over and True otherwise)
+   def step(self, action=None):
+      if self.grid.game_over:
+         return False
+      if action is not None:
+         self.apply(action)
+      # auto-fall and locking logic
+      if self.move('down'):
+         return True
+      if self.lock():
+         return False
+      self.resolve_cascade()
+      self.spawn()
+      return True
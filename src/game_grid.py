@@ -1,9 +1,34 @@
-import os
-import lib.stddraw as stddraw  # used for displaying the game grid
 from point import Point  # used for tile positions
+from tile import Tile, number_to_exponent, exponent_to_number  # tile numbers
+from board_kernels import merge_columns, remove_full_rows  # vectorized game rules
+from tile_labeler import TileLabeler  # used for finding the free tiles
+from high_score import get_high_score_store  # used for the high score
+from profiler import get_profiler  # used for timing the rendering
+from zobrist import get_zobrist_table, verify_enabled  # used for hashing
 import numpy as np  # fundamental Python module for scientific computing
 import lib.color as color  # used for coloring the game grid
-import copy
+from lazy_module import LazyModule  # used for importing stddraw lazily
+
+# the drawing library, imported when the first drawing is made so that the
+# game rules run without pygame
+stddraw = LazyModule('lib.stddraw')
+
+# the Tile objects used for drawing the tiles locked on the game grid (by the
+# exponents of their numbers)
+_display_tiles = {}
+
+# the kinds of the tiles drawn on the cells of the game grid (see the method
+# get_frame_cells of the GameGrid class)
+_LOCKED, _PREDICTION, _CURRENT = 1, 2, 3
+
+# the color used for the transparent pixels of the grid lines and boundaries
+# layers (not used by the lines and the boundaries themselves)
+_TRANSPARENT_COLOR = color.MAGENTA
+
+# the largest number of the changed cells given to _on_board_change that are
+# updated one by one (the masks are rebuilt and the board is compared with the
+# last hashed board for more cells, which is faster then)
+_MAX_CHANGED_CELLS = 32
 
 # A class for modeling the game grid
 class GameGrid:
@@ -12,8 +37,32 @@ class GameGrid:
       # set the dimensions of the game grid as the given arguments
       self.grid_height = grid_h
       self.grid_width = grid_w
-      # create a tile matrix to store the tiles locked on the game grid
-      self.tile_matrix = np.full((grid_h, grid_w), None)
+      # create a board to store the tiles locked on the game grid as the log2
+      # exponents of their numbers (0 is used for the empty cells)
+      self.board = np.zeros((grid_h, grid_w), dtype=np.uint8)
+      # the occupied cells of each row of the board as a bitmask (bit c is set
+      # when column c is occupied) used for the collision checks
+      self.row_masks = [0] * grid_h
+      # the occupied cells of each column as a bitmask (bit r is set when row r
+      # is occupied) used for computing the column heights below any row
+      self.col_masks = [0] * grid_w
+      # the version of the board (incremented whenever the board is changed)
+      self.board_version = 0
+      # the 64-bit Zobrist hash of the board (see zobrist.py), the copy of the
+      # board it was last updated for (the changed cells are found by
+      # comparing the board with it when they are not given to
+      # _on_board_change) and whether it and the masks are checked against
+      # the ones computed from scratch
+      self.zobrist = get_zobrist_table(grid_h, grid_w)
+      self.board_hash = 0
+      self.hashed_board = self.board.copy()
+      self.verify_hash = verify_enabled()
+      # the cells of the board holding the tiles merged by merge_tiles
+      self.merged_mask = np.zeros((grid_h, grid_w), dtype=bool)
+      # the labeler used for finding the tiles that are not connected to the
+      # bottom row and the cells of the tiles deleted by handle_free_tiles
+      self.labeler = TileLabeler(grid_h, grid_w)
+      self.freed_mask = np.zeros((grid_h, grid_w), dtype=bool)
       # create the tetromino that is currently being moved on the game grid
       self.current_tetromino = None
       # the game_over flag shows whether the game is over or not
@@ -28,13 +77,34 @@ class GameGrid:
       self.box_thickness = 0.010
       # score counter
       self.next_tetromino = None  # the next tetromino to enter the game grid
-      self.prediction_tetromino = None
+      # the cached landing position of the current tetromino used for drawing
+      # its prediction (ghost) and the key the position is cached for
+      self.prediction_key, self.prediction_position = None, None
+      # the values drawn on the panel next to the game grid (the score, the
+      # next tetromino and the high score) and the captured drawing of the panel
+      self.panel_key, self.panel_image = None, None
+      # when incremental_render is set, display() draws only the cells and the
+      # panel that changed since the previous frame (see get_frame_cells for
+      # drawn_cells) as long as nothing else is drawn on the canvas meanwhile
+      self.incremental_render = False
+      self.drawn_cells, self.drawn_canvas_version = None, None
+      # the drawings that do not change between the frames, captured once for
+      # the canvas size and the colors and thicknesses they are drawn with
+      # (layer_key): the background with the empty cells and the panel labels,
+      # and the grid lines and the grid boundaries on transparent layers
+      self.layer_key = None
+      self.background_layer, self.lines_layer, self.boundary_layer = None, None, None
+      # the profiler timing the rendering and the lines of its overlay drawn on
+      # the panel (the overlay is drawn only when profiling is enabled)
+      self.profiler = get_profiler()
+      self.drawn_overlay = None
       self.score = 0
       # game speed in milliseconds (modifiable via difficulty selector)
       self.game_speed = 100
    # Method used for resetting the game environment
    def reset_scene(self):
-      self.tile_matrix = np.full((self.grid_height, self.grid_width), None)
+      self.board = np.zeros((self.grid_height, self.grid_width), dtype=np.uint8)
+      self._on_board_change()
       self.current_tetromino = None
       self.display_tetromino = None
       temp_score = self.score
@@ -42,67 +112,153 @@ class GameGrid:
       self.game_over = False
       return temp_score
    
+   # A method for drawing the prediction (ghost) of where the current tetromino
+   # lands, which is drawn from the current tetromino at the landing position
    def predict(self):
-      self.prediction_tetromino = copy.deepcopy(self.current_tetromino)
-      while self.prediction_tetromino.can_be_moved("down", self):
-         self.prediction_tetromino.move("down", self)
-      self.prediction_tetromino.draw(pred = True)
+      position = self.get_prediction_position()
+      self.current_tetromino.draw(pred=True, bottom_left=position)
+
+   # A method that returns the position of the bottom left cell of the current
+   # tetromino when it lands. The position is cached for the tetromino, its
+   # rotation state, its column and the board version, as moving down does
+   # not change it.
+   def get_prediction_position(self):
+      tetromino = self.current_tetromino
+      blc = tetromino.bottom_left_cell
+      key = (tetromino, tetromino.rotation, blc.x, self.board_version)
+      if key != self.prediction_key or blc.y < self.prediction_position.y:
+         self.prediction_key = key
+         self.prediction_position = Point(
+            blc.x, blc.y - tetromino.get_drop_distance(self))
+      return self.prediction_position
 
+   # A method for drawing the score, the next tetromino and the high score on
+   # the panel next to the game grid. The drawing of the panel is captured and
+   # pasted on the next frames until any of the drawn values changes.
    def draw_score_and_next(self, score, next_tetromino):
       # ---- panel centre x (accounting for the –0.5 canvas offset) ----
       panel_start_x  = self.grid_width - 0.5
       panel_width    = self.grid_width / 3
       panel_center_x = panel_start_x + panel_width / 2
 
+      panel_key = self.get_panel_key(score, next_tetromino)
+      high_score = panel_key[2]
+      if panel_key == self.panel_key:
+         stddraw.pasteRegion(self.panel_image, panel_start_x, -0.5)
+         return
+
+      # (the labels are drawn on the background layer by draw_panel_labels)
       # --- SCORE ---
       stddraw.setPenColor(color.WHITE)
-      stddraw.setFontSize(16)
-      stddraw.boldText(panel_center_x, self.grid_height - 2, "SCORE")
-
       stddraw.setFontSize(18)
       stddraw.text(panel_center_x, self.grid_height - 3.5, str(score))
 
-      # --- NEXT ---
-      stddraw.setPenColor(color.WHITE)
-      stddraw.setFontSize(16)
-      stddraw.boldText(panel_center_x, self.grid_height - 7.2, "NEXT")
-
       # draw next tetromino, exactly centred under the label
-      temp = copy.deepcopy(next_tetromino)
-      w    = len(temp.tile_matrix[0])
+      w    = next_tetromino.state.n
       offset = (w - 1) / 2
-      temp.bottom_left_cell = Point(
+      next_position = Point(
          panel_center_x - offset,
          self.grid_height - 11
       )
-      temp.draw(next_display=True)
+      next_tetromino.draw(next_display=True, bottom_left=next_position)
 
       # --- HIGH SCORE ---
       stddraw.setPenColor(color.WHITE)
+      stddraw.setFontSize(18)
+      stddraw.text(panel_center_x, self.grid_height - 13.8, str(high_score))
+
+      # capture the drawing of the panel for the next frames
+      self.panel_key = panel_key
+      self.panel_image = stddraw.captureRegion(
+         panel_start_x, -0.5, panel_width, self.grid_height)
+
+   # A method for drawing the labels on the panel next to the game grid
+   def draw_panel_labels(self):
+      panel_x, _, panel_width, _ = self.get_panel_region()
+      panel_center_x = panel_x + panel_width / 2
+      stddraw.setPenColor(color.WHITE)
       stddraw.setFontSize(16)
+      stddraw.boldText(panel_center_x, self.grid_height - 2, "SCORE")
+      stddraw.boldText(panel_center_x, self.grid_height - 7.2, "NEXT")
       stddraw.boldText(panel_center_x, self.grid_height - 12.5, "HIGH SCORE")
 
-      stddraw.setFontSize(18)
-      high_score = self.load_high_score(score)
-      stddraw.text(panel_center_x, self.grid_height - 13.8, str(high_score))
+   # A method that returns the values drawn on the panel for the given score
+   # and next tetromino (the score, the next tetromino and the high score)
+   def get_panel_key(self, score, next_tetromino):
+      # the high score can only change when the score changes
+      if self.panel_key is None or self.panel_key[0] != score:
+         high_score = self.load_high_score(score)
+      else:
+         high_score = self.panel_key[2]
+      return (score, next_tetromino, high_score)
+
+   # A method that returns the region of the canvas covered by the game grid
+   # and the panel next to it as (x, y, width, height)
+   def get_canvas_region(self):
+      return (-0.5, -0.5, self.grid_width + self.grid_width / 3, self.grid_height)
+
+   # A method that returns the region of the canvas covered by the panel next
+   # to the game grid as (x, y, width, height)
+   def get_panel_region(self):
+      return (self.grid_width - 0.5, -0.5, self.grid_width / 3, self.grid_height)
 
-   # High score işlemi 
+   # A method that returns the region of the canvas covered by the overlay of
+   # the profiler (below the high score on the panel) as (x, y, width, height)
+   def get_overlay_region(self):
+      panel_x, panel_y, panel_width, _ = self.get_panel_region()
+      return (panel_x, panel_y, panel_width, self.grid_height - 15)
+
+   # A method for drawing the given lines (the timings of the profiler) on the
+   # overlay region of the panel
+   def draw_profile_overlay(self, lines):
+      x, y, width, height = self.get_overlay_region()
+      stddraw.setPenColor(color.WHITE)
+      stddraw.setFontSize(11)
+      for i, line in enumerate(lines):
+         stddraw.text(x + width / 2, y + height - 0.5 - 0.45 * i, line)
+
+   # High score işlemi (the high score is kept in memory by the high score
+   # store, which saves it to the file in the background)
    def load_high_score(self, current_score):
-      if not os.path.exists("highscore.txt"):
-         with open("highscore.txt", "w") as f:
-            f.write("0")
-      with open("highscore.txt", "r") as f:
-         highscore = int(f.read())
-      if current_score > highscore:
-         with open("highscore.txt", "w") as f:
-            f.write(str(current_score))
-         return current_score
-      return highscore
-   
-   # A method for displaying the game grid
-   def display(self):
-      # clear the background to empty_cell_color
-      stddraw.clear(self.empty_cell_color)
+      return get_high_score_store().submit(current_score)
+
+   # A property that returns the tiles locked on the game grid as a matrix of
+   # Tile objects (None for the empty cells) created from the board
+   @property
+   def tile_matrix(self):
+      tile_matrix = np.full((self.grid_height, self.grid_width), None)
+      for row, col in zip(*np.nonzero(self.board)):
+         tile_matrix[row][col] = Tile(exponent_to_number(self.board[row, col]))
+      return tile_matrix
+
+   # A method that returns the Tile object used for drawing the tiles with the
+   # given exponent (one shared Tile object is created for each exponent)
+   def get_display_tile(self, exponent):
+      tile = _display_tiles.get(exponent)
+      if tile is None:
+         tile = _display_tiles[exponent] = Tile(exponent_to_number(exponent))
+      return tile
+
+   # A method for displaying the game grid and pausing for msec milliseconds
+   # (game_speed when msec is not given)
+   def display(self, msec=None):
+      pause = self.game_speed if msec is None else msec
+      start = self.profiler.start()
+      # capture the layers again when the canvas or the colors are changed
+      # (which clears the canvas)
+      self.update_layers()
+      # draw only what changed since the previous frame when the canvas still
+      # shows that frame
+      if (self.incremental_render
+            and self.drawn_canvas_version == stddraw.canvasVersion()):
+         regions = self.draw_changes()
+         self.profiler.stop('draw', start)
+         start = self.profiler.start()
+         stddraw.showRegions(regions, pause)
+         self.profiler.stop('show', start)
+         return
+      # draw the background (the empty cells and the panel labels)
+      self.paste_layer(self.background_layer)
       # draw the game grid
       self.draw_grid()
       # draw the current/active tetromino if it is not None
@@ -113,23 +269,143 @@ class GameGrid:
             # draw the next tetromino and score
       if self.next_tetromino is not None and self.score is not None:
          self.draw_score_and_next(self.score, self.next_tetromino)
+      # draw the timings of the profiler when profiling is enabled
+      if self.profiler.enabled:
+         self.drawn_overlay = self.profiler.get_overlay_lines()
+         self.draw_profile_overlay(self.drawn_overlay)
          
       # draw a box around the game grid
+      self.paste_layer(self.boundary_layer)
+
+      # keep what is drawn for drawing only the changes on the next frames
+      if self.incremental_render:
+         self.drawn_cells = self.get_frame_cells()
+         self.drawn_canvas_version = stddraw.canvasVersion()
+
+      # show the resulting drawing with the given pause duration
+      self.profiler.stop('draw', start)
+      start = self.profiler.start()
+      stddraw.show(pause)
+      self.profiler.stop('show', start)
+
+   # A method that returns what is drawn on each cell of the game grid on the
+   # current frame as an array of codes: 0 for the empty cells and
+   # 4 * exponent + kind for the tiles, where exponent is the log2 exponent of
+   # the tile number and kind is _LOCKED, _PREDICTION or _CURRENT
+   def get_frame_cells(self):
+      cells = self.board.astype(np.int32) * 4
+      cells[self.board != 0] += _LOCKED
+      tetromino = self.current_tetromino
+      if tetromino is not None:
+         # the current tetromino is drawn over its prediction
+         n = tetromino.state.n  # n = number of rows = number of columns
+         for kind, blc in ((_PREDICTION, self.get_prediction_position()),
+                           (_CURRENT, tetromino.bottom_left_cell)):
+            for tile, (row, col) in zip(tetromino.tiles, tetromino.state.cells):
+               y = blc.y + (n - 1) - row
+               # only the tiles inside the game grid are drawn
+               if 0 <= y < self.grid_height:
+                  cells[y, blc.x + col] = 4 * number_to_exponent(tile.number) + kind
+      return cells
+
+   # A method for drawing the cells and the panel that changed since the last
+   # drawn frame and returning the changed regions of the canvas. Drawing is
+   # clipped to each changed region and everything covering the region is
+   # drawn again in the same order as in a full frame, so the result is the
+   # same as drawing the whole frame.
+   def draw_changes(self):
+      regions = []
+      cells = self.get_frame_cells()
+      for row, col in zip(*np.nonzero(cells != self.drawn_cells)):
+         row, col = int(row), int(col)
+         self.draw_cell(row, col, int(cells[row, col]))
+         regions.append((col - 0.5, row - 0.5, 1, 1))
+      self.drawn_cells = cells
+      panel_drawn = False
+      if self.next_tetromino is not None and self.score is not None:
+         panel_key = self.get_panel_key(self.score, self.next_tetromino)
+         if panel_key != self.panel_key:
+            region = self.get_panel_region()
+            stddraw.setClip(*region)
+            self.paste_layer(self.background_layer)
+            self.paste_layer(self.lines_layer)
+            self.draw_score_and_next(self.score, self.next_tetromino)
+            self.paste_layer(self.boundary_layer)
+            stddraw.setClip()
+            regions.append(region)
+            panel_drawn = True
+      if self.profiler.enabled:
+         lines = self.profiler.get_overlay_lines()
+         if panel_drawn or lines != self.drawn_overlay:
+            region = self.get_overlay_region()
+            stddraw.setClip(*region)
+            self.paste_layer(self.background_layer)
+            self.paste_layer(self.lines_layer)
+            self.draw_profile_overlay(lines)
+            self.paste_layer(self.boundary_layer)
+            stddraw.setClip()
+            regions.append(region)
+            self.drawn_overlay = lines
+      return regions
+
+   # A method for drawing the cell of the game grid with the given row and
+   # column indexes for the given code (see get_frame_cells)
+   def draw_cell(self, row, col, code):
+      x, y = col - 0.5, row - 0.5  # the lower left corner of the cell
+      stddraw.setClip(x, y, 1, 1)
+      self.paste_layer(self.background_layer)
+      exponent, kind = divmod(code, 4)
+      position = Point(col, row)
+      # the locked tiles are drawn below the grid lines and the others above
+      if kind == _LOCKED:
+         self.get_display_tile(exponent).draw(position)
+      self.paste_layer(self.lines_layer)
+      if kind in (_PREDICTION, _CURRENT):
+         self.get_display_tile(exponent).draw(
+            position, is_pred=(kind == _PREDICTION))
+      self.paste_layer(self.boundary_layer)
+      stddraw.setClip()
+
+   # A method that draws the layers (the drawings that do not change between
+   # the frames) on the canvas and captures them when the canvas size or any
+   # of the colors or thicknesses they are drawn with is changed
+   def update_layers(self):
+      region = self.get_canvas_region()
+      layer_key = (stddraw.regionSize(*region), str(self.empty_cell_color),
+                   str(self.line_color), str(self.boundary_color),
+                   self.line_thickness, self.box_thickness)
+      if layer_key == self.layer_key:
+         return
+      stddraw.clear(_TRANSPARENT_COLOR)
+      self.draw_lines()
+      self.lines_layer = stddraw.captureRegion(*region, transparent=_TRANSPARENT_COLOR)
+      stddraw.clear(_TRANSPARENT_COLOR)
       self.draw_boundaries()
+      self.boundary_layer = stddraw.captureRegion(*region, transparent=_TRANSPARENT_COLOR)
+      stddraw.clear(self.empty_cell_color)
+      self.draw_panel_labels()
+      self.background_layer = stddraw.captureRegion(*region)
+      self.layer_key = layer_key
+      # the captured drawing of the panel is drawn on the old background
+      self.panel_key, self.panel_image = None, None
 
-      # show the resulting drawing with a pause duration = game_speed
-      stddraw.show(self.game_speed)
+   # A method for drawing the given layer on the canvas
+   def paste_layer(self, layer):
+      x, y, _, _ = self.get_canvas_region()
+      stddraw.pasteRegion(layer, x, y)
 
    # A method for drawing the cells and the lines of the game grid
    def draw_grid(self):
       # for each cell of the game grid
-      for row in range(self.grid_height):
-         for col in range(self.grid_width):
-            # if the current grid cell is occupied by a tile
-            if self.tile_matrix[row][col] is not None:
-               # draw this tile
-               self.tile_matrix[row][col].draw(Point(col, row))
-      # draw the inner lines of the game grid
+      for row, col in zip(*np.nonzero(self.board)):
+         # draw the tile that occupies the current grid cell
+         tile = self.get_display_tile(int(self.board[row, col]))
+         tile.draw(Point(int(col), int(row)))
+      # draw the inner lines of the game grid (captured on the lines layer)
+      self.paste_layer(self.lines_layer)
+
+   # A method for drawing the inner lines of the game grid
+   def draw_lines(self):
       stddraw.setPenColor(self.line_color)
       stddraw.setPenRadius(self.line_thickness)
       # x and y ranges for the game grid
@@ -160,8 +436,60 @@ class GameGrid:
       # have tiles with position.y >= grid_height
       if not self.is_inside(row, col):
          return False  # the cell is not occupied as it is outside the grid
-      # the cell is occupied by a tile if it is not None
-      return self.tile_matrix[row][col] is not None
+      # the cell is occupied by a tile if it is not empty (0)
+      return self.board[row, col] != 0
+
+   # A method that updates the data derived from the board after the tiles
+   # locked on the game grid are changed (only on the cells with the given
+   # rows and columns when a few of them are given)
+   def _on_board_change(self, rows=None, cols=None):
+      self.board_version += 1
+      if rows is None or len(rows) > _MAX_CHANGED_CELLS:
+         # rebuild the masks and update the hash for the cells that are
+         # different from the last hashed board (e.g. after the tiles are
+         # merged or the full rows are cleared)
+         self.row_masks, self.col_masks = self._pack_masks()
+         self.board_hash = self.zobrist.update(self.board_hash,
+                                               self.hashed_board, self.board)
+         self.hashed_board[...] = self.board
+      else:
+         # set or clear only the bits of the given cells in the masks and
+         # replace only their keys in the hash
+         row_masks, col_masks = self.row_masks, self.col_masks
+         key_lists = self.zobrist.key_lists
+         board_hash = self.board_hash
+         for row, col in zip(rows, cols):
+            old = self.hashed_board.item(row, col)
+            new = self.board.item(row, col)
+            if new:
+               row_masks[row] |= 1 << col
+               col_masks[col] |= 1 << row
+            else:
+               row_masks[row] &= ~(1 << col)
+               col_masks[col] &= ~(1 << row)
+            board_hash ^= key_lists[row][col][old] ^ key_lists[row][col][new]
+            self.hashed_board[row, col] = new
+         self.board_hash = board_hash
+      if self.verify_hash:
+         if self.board_hash != self.zobrist.hash(self.board):
+            raise RuntimeError('incremental board hash differs from the full hash')
+         if (self.row_masks, self.col_masks) != self._pack_masks():
+            raise RuntimeError('incremental board masks differ from the board')
+
+   # A method that returns the occupied cells of each row and of each column
+   # of the board packed into integer bitmasks
+   def _pack_masks(self):
+      occupied = np.packbits(self.board != 0, axis=1, bitorder='little')
+      row_masks = [int.from_bytes(row.tobytes(), 'little') for row in occupied]
+      occupied = np.packbits(self.board.T != 0, axis=1, bitorder='little')
+      col_masks = [int.from_bytes(col.tobytes(), 'little') for col in occupied]
+      return row_masks, col_masks
+
+   # A method that returns the height of the tiles in the given column below
+   # the given row, that is 1 + the row index of the topmost tile below the
+   # row (or 0 when there is no tile below the row)
+   def get_column_height(self, col, below_row):
+      return (self.col_masks[col] & ((1 << below_row) - 1)).bit_length()
 
    # A method for checking whether the cell with the given row and col indexes
    # is inside the game grid or not
@@ -172,86 +500,41 @@ class GameGrid:
          return False
       return True
    
-   # Merging tiles
+   # Merging tiles (the columns are merged at once by merge_columns, and the
+   # cells holding the merged tiles are stored in merged_mask)
    def merge_tiles(self):
-      gained = 0
-      H, W = self.grid_height, self.grid_width
-      for col in range(W):
-         row = 0
-         while row < H - 1:
-            bot = self.tile_matrix[row][col]
-            top = self.tile_matrix[row+1][col]
-            if bot and top and bot.number == top.number:
-               bot.number *= 2
-               bot.update_color()
-               gained += bot.number
-               # remove the above tile and collapse
-               self.tile_matrix[row+1][col] = None
-               for rr in range(row+2, H):
-                  self.tile_matrix[rr-1][col] = self.tile_matrix[rr][col]
-                  self.tile_matrix[H-1][col] = None
-            else:
-               row += 1
+      gained, self.merged_mask = merge_columns(self.board)
+      gained = int(gained)
+      if gained:
+         self._on_board_change()
       self.score += gained
       return gained
 
-   # Clearing full rows
+   # Clearing full rows (all the full rows are found and removed at once by
+   # remove_full_rows, and the indexes of the cleared rows are returned)
    def clear_full_rows(self):
-      cleared_count = 0
-
-      # Scan from bottom to top
-      row = 0
-      while row < self.grid_height:
-         # Check if this row is completely full
-         if all(self.tile_matrix[row][c] is not None for c in range(self.grid_width)):
-            # Clear the row
-            for c in range(self.grid_width):
-               self.tile_matrix[row][c] = None
-
-            # Shift everything above down by one
-            for r in range(row + 1, self.grid_height):
-               for c in range(self.grid_width):
-                  self.tile_matrix[r - 1][c] = self.tile_matrix[r][c]
-
-            # Empty out the new top row
-            for c in range(self.grid_width):
-               self.tile_matrix[self.grid_height - 1][c] = None
-
-            cleared_count += 1
-            # Do not advance row index—after shifting this same row index now holds
-            # what used to be the row above so we need to check it again.
-         else:
-            row += 1
-
-      return cleared_count
-
-   # Handling free tiles (deleting free tiles)
+      full_rows = np.flatnonzero(remove_full_rows(self.board)).tolist()
+      if full_rows:
+         self._on_board_change()
+      return full_rows
+
+   # Handling free tiles (the tiles that are not connected to the bottom row
+   # are found by the labeler and deleted, and their cells are stored in
+   # freed_mask)
    def handle_free_tiles(self):
-      H, W = self.grid_height, self.grid_width
-      # flood‑fill from bottom row
-      visited = [[False]*W for _ in range(H)]
-      stack = []
-      for c in range(W):
-         if self.tile_matrix[0][c]:
-            visited[0][c] = True
-            stack.append((0, c))
-         while stack:
-            r, c = stack.pop()
-            for dr, dc in ((1,0),(-1,0),(0,1),(0,-1)):
-               rr, cc = r+dr, c+dc
-               if 0 <= rr < H and 0 <= cc < W and not visited[rr][cc] and self.tile_matrix[rr][cc]:
-                  visited[rr][cc] = True
-                  stack.append((rr, cc))
-      # remove unvisited/free tiles
-      gained = 0
-      for r in range(H):
-         for c in range(W):
-            if self.tile_matrix[r][c] and not visited[r][c]:
-               gained += self.tile_matrix[r][c].number
-               self.tile_matrix[r][c] = None
+      gained, self.freed_mask = self.labeler.remove_free_tiles(self.board)
+      if gained:
+         rows, cols = np.nonzero(self.freed_mask)
+         self._on_board_change(rows.tolist(), cols.tolist())
       self.score += gained
       return gained
 
+   # A method for replacing the tiles locked on the game grid with the given
+   # board (e.g. a step of a cascade resolved by a CascadeResolver)
+   def set_board(self, board):
+      self.board[...] = board
+      self._on_board_change()
+
    # A method that locks the tiles of a landed tetromino on the grid checking
    # if the game is over due to having any tile above the topmost grid row.
    # (This method returns True when the game is over and False otherwise.)
@@ -260,6 +543,8 @@ class GameGrid:
       self.current_tetromino = None
       # lock the tiles of the current tetromino (tiles_to_lock) on the grid
       n_rows, n_cols = len(tiles_to_lock), len(tiles_to_lock[0])
+      # the cells of the locked tiles (for updating the hash of the board)
+      locked_rows, locked_cols = [], []
       for col in range(n_cols):
          for row in range(n_rows):
             # place each tile (occupied cell) onto the game grid
@@ -269,9 +554,13 @@ class GameGrid:
                pos.x = blc_position.x + col
                pos.y = blc_position.y + (n_rows - 1) - row
                if self.is_inside(pos.y, pos.x):
-                  self.tile_matrix[pos.y][pos.x] = tiles_to_lock[row][col]
+                  tile_number = tiles_to_lock[row][col].number
+                  self.board[pos.y, pos.x] = number_to_exponent(tile_number)
+                  locked_rows.append(pos.y)
+                  locked_cols.append(pos.x)
                # the game is over if any placed tile is above the game grid
                else:
                   self.game_over = True
+      self._on_board_change(locked_rows, locked_cols)
       # return the value of the game_over flag
       return self.game_over
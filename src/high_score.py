@@ -0,0 +1,118 @@
+import os  # the os module is used for file and directory operations
+import stat  # used for keeping the permissions of the high score file
+import atexit  # used for saving the high score when the program exits
+import tempfile  # used for writing the high score file atomically
+import threading  # used for saving the high score in the background
+
+# the file the high score is saved to (in the current working directory)
+DEFAULT_PATH = "highscore.txt"
+# the permissions of the new high score files (the default permissions of the
+# files created by open, i.e. 0o666 without the bits of the umask, which can
+# only be read by setting it, so it is read once when the module is imported)
+_umask = os.umask(0)
+os.umask(_umask)
+NEW_FILE_MODE = 0o666 & ~_umask
+
+# A class for keeping the high score in memory. The high score file is read
+# once when the store is created, and the high score is saved back to the file
+# by a background thread only when a new record is set (and at exit), so that
+# it can be looked up on every frame without any file operations.
+class HighScoreStore:
+   # A constructor for creating a store for the high score file at given path
+   def __init__(self, path=DEFAULT_PATH):
+      self.path = path
+      self.high_score = self.read_file()
+      # the high score last saved to (or read from) the file
+      self.saved_score = self.high_score
+      # the lock for saving the high score and the event used for waking up
+      # the background thread when there is a new high score to save
+      self._lock = threading.Lock()
+      self._dirty = threading.Event()
+      self._closed = False
+      self._thread = None
+      atexit.register(self.close)
+
+   # A method that reads and returns the high score in the file (0 when the
+   # file does not exist or it cannot be parsed)
+   def read_file(self):
+      try:
+         with open(self.path, "r") as f:
+            return int(f.read().strip() or 0)
+      except (OSError, ValueError):
+         return 0
+
+   # A method that returns the permissions of the high score file (the ones
+   # of a new file when the file does not exist)
+   def get_file_mode(self):
+      try:
+         return stat.S_IMODE(os.stat(self.path).st_mode)
+      except OSError:
+         return NEW_FILE_MODE
+
+   # A method that updates the high score with the given score and returns the
+   # (possibly updated) high score
+   def submit(self, score):
+      if score > self.high_score:
+         self.high_score = score
+         self._schedule_save()
+      return self.high_score
+
+   # A method that wakes up the background thread (starting it if necessary)
+   # for saving the high score
+   def _schedule_save(self):
+      if self._closed:
+         return
+      if self._thread is None:
+         self._thread = threading.Thread(target=self._run, daemon=True)
+         self._thread.start()
+      self._dirty.set()
+
+   # The loop of the background thread that saves the high score
+   def _run(self):
+      while True:
+         self._dirty.wait()
+         self._dirty.clear()
+         if self._closed:
+            return
+         self.save()
+
+   # A method that saves the high score to the file when it is higher than
+   # the saved one. The file is written to a temporary file that is renamed
+   # over it, so it is never left half written, and a higher score saved by
+   # another instance of the game in the meantime is kept.
+   def save(self):
+      with self._lock:
+         if self.high_score <= self.saved_score:
+            return
+         score = max(self.high_score, self.read_file())
+         directory = os.path.dirname(os.path.abspath(self.path))
+         fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+         try:
+            with os.fdopen(fd, "w") as f:
+               f.write(str(score))
+            # mkstemp creates the file readable only by its owner, so it is
+            # given the permissions of the file it replaces (or of a new file)
+            os.chmod(temp_path, self.get_file_mode())
+            os.replace(temp_path, self.path)
+         except OSError:
+            if os.path.exists(temp_path):
+               os.remove(temp_path)
+            return
+         self.saved_score = score
+         self.high_score = max(self.high_score, score)
+
+   # A method that stops the background thread and saves the high score
+   def close(self):
+      self._closed = True
+      self._dirty.set()
+      self.save()
+
+# the stores created for the high score files (one store for each file)
+_stores = {}
+
+# A function that returns the store for the high score file at given path
+def get_high_score_store(path=DEFAULT_PATH):
+   store = _stores.get(path)
+   if store is None:
+      store = _stores[path] = HighScoreStore(path)
+   return store
@@ -0,0 +1,50 @@
+import time  # used for the monotonic clock
+
+# the delayed auto shift (DAS), i.e., the time a key must be held down before it
+# starts repeating, and the auto repeat rate (ARR), i.e., the time between the
+# repeats, in milliseconds
+DEFAULT_DAS = 170
+DEFAULT_ARR = 50
+
+# A class for repeating the keys that are held down (e.g. for moving the
+# current tetromino to a side without typing the key again and again). A key
+# starts repeating when it is held down for das milliseconds after it is typed
+# and then repeats once every arr milliseconds until it is released.
+class KeyRepeater:
+   # A constructor for creating a repeater for the keys with the given names
+   def __init__(self, repeat_keys, das=DEFAULT_DAS, arr=DEFAULT_ARR,
+                clock=time.monotonic):
+      self.repeat_keys = set(repeat_keys)
+      self.das = das / 1000.0
+      self.arr = arr / 1000.0
+      self.clock = clock
+      # the time of the next repeat of each key that is held down
+      self.next_repeats = {}
+
+   # A method for starting the delayed auto shift of the given key typed at
+   # the given time (the time from the same clock as the repeater)
+   def press(self, key, typed_time):
+      if key in self.repeat_keys:
+         self.next_repeats[key] = typed_time + self.das
+
+   # A method for stopping all the repeats (e.g. after a menu is displayed)
+   def reset(self):
+      self.next_repeats.clear()
+
+   # A method that returns the keys to repeat now, where is_held is a function
+   # telling whether the key with the given name is still held down. Each key
+   # is repeated at most once per call; the repeats missed when the calls are
+   # late are skipped instead of being returned one after another.
+   def get_repeats(self, is_held):
+      now = self.clock()
+      keys = []
+      for key, next_repeat in list(self.next_repeats.items()):
+         if not is_held(key):
+            del self.next_repeats[key]
+         elif next_repeat <= now:
+            keys.append(key)
+            next_repeat += self.arr
+            if next_repeat <= now:
+               next_repeat = now + self.arr
+            self.next_repeats[key] = next_repeat
+      return keys
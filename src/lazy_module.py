@@ -0,0 +1,17 @@
+import importlib  # used for importing the module on its first use
+
+# A class for standing in for a module that is imported only when any of its
+# attributes is first used (e.g. lib.stddraw, which imports pygame and opens
+# no window until something is drawn, so the game rules run without pygame)
+class LazyModule:
+   # A constructor for creating a stand-in for the module with the given name
+   def __init__(self, name):
+      self._name = name
+      self._module = None
+
+   # A method that returns the given attribute of the module (importing the
+   # module if it is not imported yet)
+   def __getattr__(self, attribute):
+      if self._module is None:
+         self._module = importlib.import_module(self._name)
+      return getattr(self._module, attribute)
@@ -10,6 +10,7 @@ commonly used Color objects defined in the color module.
 import time
 import os
 import sys
+import collections
 
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = 'hide'
 import pygame
@@ -95,11 +96,32 @@ _canvasWidth = float(_DEFAULT_CANVAS_SIZE)
 _canvasHeight = float(_DEFAULT_CANVAS_SIZE)
 _penRadius = None
 _penColor = _DEFAULT_PEN_COLOR
-_keysTyped = []
+
+# The queue of the keys typed by the user as (key, time) pairs, where time is
+# the time.monotonic() value when the key press was received, and the keys
+# that are currently held down mapped to the times they were pressed.
+_keysTyped = collections.deque()
+_keysHeld = {}
+
+# The fonts created so far, keyed by (family, size, bold), and the most
+# recently rendered strings, keyed by (family, size, bold, string, color),
+# so that the same labels are not rendered again on every frame.
+_TEXT_CACHE_SIZE = 512
+_fonts = {}
+_renderedTexts = collections.OrderedDict()
+
+# A number incremented whenever the whole background canvas is cleared or
+# its size or scale is changed, so that the callers drawing only the changed
+# parts of the canvas can tell when everything must be drawn again.
+_canvasVersion = 0
 
 # Has the window been created?
 _windowCreated = False
 
+# The type of the event posted when the window loses the keyboard focus
+# (not defined by older versions of pygame)
+_WINDOWFOCUSLOST = getattr(pygame, 'WINDOWFOCUSLOST', -1)
+
 #-----------------------------------------------------------------------
 # Begin added by Alan J. Broder
 #-----------------------------------------------------------------------
@@ -171,6 +193,7 @@ def setCanvasSize(w=_DEFAULT_CANVAS_SIZE, h=_DEFAULT_CANVAS_SIZE):
     global _canvasWidth
     global _canvasHeight
     global _windowCreated
+    global _canvasVersion
 
     if _windowCreated:
         raise Exception('The stddraw window already was created')
@@ -185,6 +208,7 @@ def setCanvasSize(w=_DEFAULT_CANVAS_SIZE, h=_DEFAULT_CANVAS_SIZE):
     _surface = pygame.Surface((w, h))
     _surface.fill(_pygameColor(WHITE))
     _windowCreated = True
+    _canvasVersion += 1
 
 def setXscale(min=_DEFAULT_XMIN, max=_DEFAULT_XMAX):
     """
@@ -193,6 +217,7 @@ def setXscale(min=_DEFAULT_XMIN, max=_DEFAULT_XMAX):
     """
     global _xmin
     global _xmax
+    global _canvasVersion
     min = float(min)
     max = float(max)
     if min >= max:
@@ -200,6 +225,7 @@ def setXscale(min=_DEFAULT_XMIN, max=_DEFAULT_XMAX):
     size = max - min
     _xmin = min - _BORDER * size
     _xmax = max + _BORDER * size
+    _canvasVersion += 1
 
 def setYscale(min=_DEFAULT_YMIN, max=_DEFAULT_YMAX):
     """
@@ -208,6 +234,7 @@ def setYscale(min=_DEFAULT_YMIN, max=_DEFAULT_YMAX):
     """
     global _ymin
     global _ymax
+    global _canvasVersion
     min = float(min)
     max = float(max)
     if min >= max:
@@ -215,6 +242,7 @@ def setYscale(min=_DEFAULT_YMIN, max=_DEFAULT_YMAX):
     size = max - min
     _ymin = min - _BORDER * size
     _ymax = max + _BORDER * size
+    _canvasVersion += 1
 
 def setPenRadius(r=_DEFAULT_PEN_RADIUS):
     """
@@ -480,6 +508,38 @@ def filledPolygon(x, y):
     points.append((xScaled[0], yScaled[0]))
     pygame.draw.polygon(_surface, _pygameColor(_penColor), points, 0)
 
+def _font(bold):
+    """
+    Return the font with the current font family and font size (bold
+    if bold is True), creating it only the first time it is used.
+    """
+    key = (_fontFamily, _fontSize, bold)
+    font = _fonts.get(key)
+    if font is None:
+        font = pygame.font.SysFont(_fontFamily, _fontSize, bold)
+        _fonts[key] = font
+    return font
+
+def _renderText(s, bold):
+    """
+    Return a surface with string s rendered in the current font and pen
+    color (bold if bold is True). The surfaces of the most recently
+    rendered strings are reused, and the least recently used one is
+    discarded when there are more than _TEXT_CACHE_SIZE of them.
+    """
+    c = _penColor
+    key = (_fontFamily, _fontSize, bold, s,
+           c.getRed(), c.getGreen(), c.getBlue())
+    text = _renderedTexts.get(key)
+    if text is not None:
+        _renderedTexts.move_to_end(key)
+        return text
+    text = _font(bold).render(s, 1, _pygameColor(c))
+    _renderedTexts[key] = text
+    if len(_renderedTexts) > _TEXT_CACHE_SIZE:
+        _renderedTexts.popitem(last=False)
+    return text
+
 def text(x, y, s):
     """
     Draw string s on the background canvas centered at (x, y).
@@ -489,8 +549,7 @@ def text(x, y, s):
     y = float(y)
     xs = _scaleX(x)
     ys = _scaleY(y)
-    font = pygame.font.SysFont(_fontFamily, _fontSize)
-    text = font.render(s, 1, _pygameColor(_penColor))
+    text = _renderText(s, False)
     textpos = text.get_rect(center=(xs, ys))
     _surface.blit(text, textpos)
 
@@ -503,8 +562,7 @@ def boldText(x, y, s):
     y = float(y)
     xs = _scaleX(x)
     ys = _scaleY(y)
-    font = pygame.font.SysFont(_fontFamily, _fontSize, True)
-    text = font.render(s, 1, _pygameColor(_penColor))
+    text = _renderText(s, True)
     textpos = text.get_rect(center=(xs, ys))
     _surface.blit(text, textpos)
 
@@ -530,13 +588,81 @@ def picture(pic, x=None, y=None):
     picSurface = pic._surface # violates encapsulation
     _surface.blit(picSurface, [xs-ws/2.0, ys-hs/2.0, ws, hs])
 
+def _pixelRect(x, y, w, h):
+    """
+    Return the pygame.Rect of the pixels of the background canvas
+    covered by the rectangle of width w and height h whose lower left
+    point is (x, y).
+    """
+    left = int(round(_scaleX(float(x))))
+    right = int(round(_scaleX(float(x) + float(w))))
+    top = int(round(_scaleY(float(y) + float(h))))
+    bottom = int(round(_scaleY(float(y))))
+    return pygame.Rect(left, top, right - left, bottom - top)
+
+def regionSize(x, y, w, h):
+    """
+    Return the size (width, height) in pixels of the part of the
+    background canvas covered by the rectangle of width w and height h
+    whose lower left point is (x, y).
+    """
+    return _pixelRect(x, y, w, h).size
+
+def captureRegion(x, y, w, h, transparent=None):
+    """
+    Return a copy of the part of the background canvas covered by the
+    rectangle of width w and height h whose lower left point is (x, y).
+    The copy can be drawn again (anywhere) with pasteRegion(). If
+    transparent, an object of class color.Color, is given, the pixels
+    of the copy with that color are not drawn by pasteRegion().
+    """
+    _makeSureWindowCreated()
+    rect = _pixelRect(x, y, w, h).clip(_surface.get_rect())
+    region = _surface.subsurface(rect).copy()
+    if transparent is not None:
+        region.set_colorkey(_pygameColor(transparent))
+    return region
+
+def pasteRegion(region, x, y):
+    """
+    Draw region, a copy of a part of the background canvas returned
+    by captureRegion(), on the background canvas with its lower left
+    point at (x, y).
+    """
+    _makeSureWindowCreated()
+    left = int(round(_scaleX(float(x))))
+    bottom = int(round(_scaleY(float(y))))
+    _surface.blit(region, (left, bottom - region.get_height()))
+
+def setClip(x=None, y=None, w=None, h=None):
+    """
+    Restrict the subsequent drawing on the background canvas to the
+    rectangle of width w and height h whose lower left point is (x, y).
+    Calling setClip() with no arguments allows drawing on the whole
+    background canvas again.
+    """
+    _makeSureWindowCreated()
+    if x is None:
+        _surface.set_clip(None)
+    else:
+        _surface.set_clip(_pixelRect(x, y, w, h))
+
+def canvasVersion():
+    """
+    Return a number that changes whenever the whole background canvas
+    is cleared or its size or scale is changed.
+    """
+    return _canvasVersion
+
 def clear(c=WHITE):
     """
     Clear the background canvas to color c, where c is an
     object of class color.Color. c defaults to stddraw.WHITE.
     """
+    global _canvasVersion
     _makeSureWindowCreated()
     _surface.fill(_pygameColor(c))
+    _canvasVersion += 1
 
 def save(f):
     """
@@ -578,6 +704,16 @@ def _showAndWaitForever():
         time.sleep(QUANTUM)
         _checkForEvents()
 
+def _showRegions(rects):
+    """
+    Copy the given pixel rectangles of the background canvas to the
+    window canvas.
+    """
+    for rect in rects:
+        _background.blit(_surface, rect, rect)
+    pygame.display.update(rects)
+    _checkForEvents()
+
 def show(msec=float('inf')):
     """
     Copy the background canvas to the window canvas, and
@@ -588,6 +724,24 @@ def show(msec=float('inf')):
 
     _makeSureWindowCreated()
     _show()
+    _wait(msec)
+
+def showRegions(regions, msec=0.0):
+    """
+    Copy the parts of the background canvas covered by regions, a
+    list of (x, y, w, h) rectangles whose lower left points are (x, y),
+    to the window canvas, and then wait for msec milliseconds. Only
+    the given parts of the window are updated, so this is faster than
+    show() when little has changed since the last call.
+    """
+    _makeSureWindowCreated()
+    _showRegions([_pixelRect(*region) for region in regions])
+    _wait(msec)
+
+def _wait(msec):
+    """
+    Wait for msec milliseconds while checking for events.
+    """
     _checkForEvents()
 
     # Sleep for the required time, but check for events every
@@ -651,7 +805,6 @@ def _checkForEvents():
     pressed).  If a key has been typed, then put that key in a queue.
     """
     global _surface
-    global _keysTyped
     
     #-------------------------------------------------------------------
     # Begin added by Alan J. Broder
@@ -668,7 +821,15 @@ def _checkForEvents():
         if event.type == pygame.QUIT:
             sys.exit()
         elif event.type == pygame.KEYDOWN:
-            _keysTyped = [pygame.key.name(event.key)] + _keysTyped
+            key = pygame.key.name(event.key)
+            now = time.monotonic()
+            _keysTyped.append((key, now))
+            _keysHeld[key] = now
+        elif event.type == pygame.KEYUP:
+            _keysHeld.pop(pygame.key.name(event.key), None)
+        elif event.type == _WINDOWFOCUSLOST:
+            # the keys released in another window are never reported
+            _keysHeld.clear()
         elif (event.type == pygame.MOUSEBUTTONUP) and \
             (event.button == 3):
             _saveToFile()
@@ -690,28 +851,49 @@ def _checkForEvents():
 
 # Functions for retrieving keys
 
+def pollEvents():
+    """
+    Check if any new event has occured (such as a key typed or button
+    pressed) without copying the background canvas to the window
+    canvas.
+    """
+    _makeSureWindowCreated()
+    _checkForEvents()
+
 def hasNextKeyTyped():
     """
     Return True if the queue of the keys the user typed is not empty.
     Otherwise return False.
     """
-    global _keysTyped
-    return _keysTyped != []
+    return len(_keysTyped) > 0
 
 def nextKeyTyped():
     """
     Remove the first key from the queue of the keys that the user typed,
     and return that key.
     """
-    global _keysTyped
-    return _keysTyped.pop()
+    return _keysTyped.popleft()[0]
+
+def nextKeyEvent():
+    """
+    Remove the first key from the queue of the keys that the user typed,
+    and return that key and the time.monotonic() value when it was
+    typed as a (key, time) pair.
+    """
+    return _keysTyped.popleft()
+
+def isKeyHeld(key):
+    """
+    Return True if the key with the given name is currently held down.
+    Otherwise return False.
+    """
+    return key in _keysHeld
 
 def clearKeysTyped():
     """
     Clear all the keys in the queue of the keys that the user typed.
     """
-    global _keysTyped
-    _keysTyped = []
+    _keysTyped.clear()
 
 #-----------------------------------------------------------------------
 # Begin added by Alan J. Broder
@@ -8,14 +8,34 @@ import lib.stddraw as stddraw  # for creating an animation with user interaction
 from lib.picture import Picture  # used for displaying an image on the game menu
 from lib.color import Color  # used for coloring the game menu
 import os  # the os module is used for file and directory operations
-from game_grid import GameGrid  # the class for modeling the game grid
-from tetromino import Tetromino  # the class for modeling the tetrominoes
-import random  # used for creating tetrominoes with random types (shapes)
+import time  # used for measuring the input latency
+from game_engine import GameEngine  # the class for applying the game rules
+from frame_scheduler import FrameScheduler  # used for timing the game loop
+from key_repeat import KeyRepeater  # used for repeating the keys held down
+from profiler import get_profiler  # used for timing the game loop
+from placement_search import PlacementSearch  # used for the hints
 # sound lib
 import vlc
 
 # The Animation Delay variable
 MERGE_ANIM_DELAY = 150
+# The periods of handling the keys typed by the user and of rendering the game
+# grid in milliseconds (independent of the game speed)
+INPUT_POLL_INTERVAL = 5
+FRAME_INTERVAL = 1000 / 60
+
+# The engine actions triggered by the keys typed by the user
+KEY_ACTIONS = {
+   'left': 'left', 'right': 'right', 'down': 'down',
+   'c': 'rotate_clockwise', 'C': 'rotate_clockwise',
+   'z': 'rotate_counter_clockwise', 'Z': 'rotate_counter_clockwise',
+   'space': 'hard_drop',
+}
+# The keys repeated while they are held down (see key_repeat.py)
+REPEAT_KEYS = ('left', 'right', 'down')
+# The keys moving the current tetromino to the placement suggested by the
+# placement search (see placement_search.py)
+HINT_KEYS = ('h', 'H')
 
 # The main function where this program starts execution
 def start():
@@ -38,133 +58,151 @@ def start():
    stddraw.setXscale(-0.5, grid_w + (grid_w / 3) - 0.5)
    stddraw.setYscale(-0.5, grid_h - 0.5)
 
-   # set the game grid dimension values stored and used in the Tetromino class
-   Tetromino.grid_height = grid_h
-   Tetromino.grid_width = grid_w
-   # create the game grid and choose speed via merged menu
-   grid = GameGrid(grid_h, grid_w)
+   # create the game engine (with the game grid and the first tetrominoes to
+   # enter the game grid) and choose speed via merged menu
+   engine = GameEngine(grid_h, grid_w)
+   grid = engine.grid
+   # draw only the parts of the game grid that change between the frames
+   grid.incremental_render = True
    selected_speed = display_game_menu(grid_h, grid_w)
    grid.game_speed = selected_speed
-   # create the first tetromino to enter the game grid
-   # by using the create_tetromino function defined below
-   grid.current_tetromino = create_tetromino()
-   grid.next_tetromino = create_tetromino()
-   grid.current_tetromino = grid.current_tetromino
+
+   # schedule the gravity ticks, the input polling and the rendering with
+   # their own periods (the cascade after locking a tetromino is animated by
+   # another task scheduled when it starts)
+   scheduler = FrameScheduler()
+   scheduler.schedule('gravity', grid.game_speed)
+   scheduler.schedule('input', INPUT_POLL_INTERVAL)
+   scheduler.schedule('render', FRAME_INTERVAL, delay=0)
+   # the moves repeated while their keys are held down
+   repeater = KeyRepeater(REPEAT_KEYS)
+   # the profiler timing the phases of the game loop (when it is enabled by
+   # the environment variable given in profiler.py)
+   profiler = get_profiler()
+   # the search suggesting the placements of the tetrominoes as hints
+   searcher = PlacementSearch(grid_h, grid_w)
 
    # initialize pause state
    reset = False
 
    has_won = False
+   # whether the cascade after locking a tetromino is being animated
+   animating = False
 
    # the main game loop
    while True:
-      # input handling (including pause toggle)
-      if stddraw.hasNextKeyTyped():
-         key_typed = stddraw.nextKeyTyped()
-         if key_typed == "P" or key_typed == "p":
-            # pause the game when the p key is pressed
-            reset = display_pause_menu(grid_w, grid_h)  # Show pause menu
-            
-         if not reset:
-            # original key-driven moves
-            if key_typed == 'left':
-               grid.current_tetromino.move(key_typed, grid)
-            elif key_typed == 'right':
-               grid.current_tetromino.move(key_typed, grid)
-            elif key_typed == 'down':
-               grid.current_tetromino.move(key_typed, grid)
-            elif key_typed in ('C','c'):
-               grid.current_tetromino.rotate_clockwise(grid)
-            elif key_typed in ('Z','z'):
-               grid.current_tetromino.rotate_counter_clockwise(grid)
-            elif key_typed == 'space':
-               while grid.current_tetromino.move('down', grid):
-                  pass
-         stddraw.clearKeysTyped()
+      # input handling (including pause toggle); the keys typed during the
+      # animation of a cascade are handled after the next tetromino enters
+      if scheduler.due('input'):
+         phase_start = profiler.start()
+         stddraw.pollEvents()
+         # all the keys typed since the last poll are handled in order
+         while not animating and stddraw.hasNextKeyTyped():
+            key_typed, typed_time = stddraw.nextKeyEvent()
+            if key_typed == "P" or key_typed == "p":
+               # pause the game when the p key is pressed
+               reset = display_pause_menu(grid_w, grid_h)  # Show pause menu
+               # drop the keys typed on the pause menu
+               stddraw.clearKeysTyped()
+               repeater.reset()
+               scheduler.restart()
+               phase_start = profiler.start()  # the pause is not timed
+            elif key_typed in HINT_KEYS:
+               # move the current tetromino to the suggested placement
+               placement = searcher.best_placement(grid)
+               if placement is not None:
+                  engine.move_to(*placement)
+            elif key_typed in KEY_ACTIONS:
+               # the time between typing the key and handling it
+               latency = time.monotonic() - typed_time
+               profiler.add('input_latency', int(latency * 1e9))
+               # original key-driven moves
+               engine.apply(KEY_ACTIONS[key_typed])
+               repeater.press(key_typed, typed_time)
+         # repeat the moves of the keys held down
+         if not animating and not reset:
+            for key in repeater.get_repeats(stddraw.isKeyHeld):
+               engine.apply(KEY_ACTIONS[key])
+         profiler.stop('input', phase_start)
 
       # if paused, show PAUSED text and skip updates
       if reset:
-         do_reset(grid)  # Reset the game grid
+         do_reset(engine)  # Reset the game grid
          # re-select difficulty and apply to grid
          selected_speed = display_game_menu(grid_h, grid_w)
          grid.game_speed = selected_speed
+         scheduler.schedule('gravity', grid.game_speed)
+         scheduler.restart()
          reset = False
          continue
 
+      if animating:
+         # one step of the merges, line clears and floating tiles on each
+         # animation period until nothing is left to do
+         if scheduler.due('animation'):
+            step = next(cascade_steps, None)
+            if step is not None:
+               with profiler.phase('cascade'):
+                  engine.apply_cascade_step(step)
+            else:
+               animating = False
+               scheduler.cancel('animation')
+               engine.spawn()
+               scheduler.schedule('gravity', grid.game_speed)
+
       # auto-fall and locking logic
-      success = grid.current_tetromino.move('down', grid)
-
-      if not success:
-         tiles, pos = grid.current_tetromino.get_min_bounded_tile_matrix(True)
-         game_over = grid.update_grid(tiles, pos)
-         # check if the game is over by using the check_win_condition function defined below
-         if not has_won and check_win_condition(grid.score):
-            # display the win screen by using the display_win_screen function defined below
-            reset = display_win_screen(grid_h, grid_w, grid.score, grid)
-            has_won = True  # Artık tekrar win ekranı gelmez
-
-            if reset:
-               do_reset(grid)
-               display_game_menu(grid_h, grid_w)  # Display the game menu again
-               reset = False  # Reset the flag to False
-               continue  # Restart the game
-
-         if game_over:
-            grid.game_over = True
-            # display the game over screen by using the display_game_over function defined below
-            reset = display_game_over(grid_w, grid_h, grid.score, grid)
-            if reset:
-               do_reset(grid)  # Reset the game grid
-               display_game_menu(grid_h, grid_w)  # Display the game menu again
-               reset = False  # Reset the flag to False
-               continue  # Restart the game      
-         
-         while True:
-            # 1) merges
-            if grid.merge_tiles():
-               _animate_step(grid)
-               continue
-            # 2) line clears
-            if grid.clear_full_rows():
-               _animate_step(grid)
-               continue
-            # 3) floating tiles
-            if grid.handle_free_tiles():
-               _animate_step(grid)
-               continue
-            break  # nothing left to do
-
-         grid.current_tetromino = grid.next_tetromino
-         grid.next_tetromino = create_tetromino()
-
-      # render the grid
-      grid.display()
-
-def _animate_step(grid):
-   old_speed = grid.game_speed
-   grid.game_speed = max(MERGE_ANIM_DELAY, old_speed)
-   grid.display()
-   grid.game_speed = old_speed
-
-def do_reset(grid):
-   grid.reset_scene()  # Reset the game grid
-   # create the first tetromino to enter the game grid
-   grid.current_tetromino = create_tetromino()
-   grid.next_tetromino = create_tetromino()
+      elif scheduler.due('gravity'):
+         with profiler.phase('gravity'):
+            moved = engine.move('down')
+         if not moved:
+            with profiler.phase('lock'):
+               game_over = engine.lock()
+            # check if the game is over by using the check_win_condition function defined below
+            if not has_won and check_win_condition(grid.score):
+               # display the win screen by using the display_win_screen function defined below
+               reset = display_win_screen(grid_h, grid_w, grid.score, grid)
+               has_won = True  # Artık tekrar win ekranı gelmez
+               scheduler.restart()
+
+               if reset:
+                  do_reset(engine)
+                  display_game_menu(grid_h, grid_w)  # Display the game menu again
+                  scheduler.restart()
+                  reset = False  # Reset the flag to False
+                  continue  # Restart the game
+
+            if game_over:
+               grid.game_over = True
+               # display the game over screen by using the display_game_over function defined below
+               reset = display_game_over(grid_w, grid_h, grid.score, grid)
+               if reset:
+                  do_reset(engine)  # Reset the game grid
+                  display_game_menu(grid_h, grid_w)  # Display the game menu again
+                  scheduler.restart()
+                  reset = False  # Reset the flag to False
+                  continue  # Restart the game      
+
+            # start animating the cascade (from its first step)
+            with profiler.phase('cascade'):
+               cascade_steps = iter(engine.get_cascade().steps)
+            animating = True
+            # the gravity is rescheduled when the next tetromino enters
+            scheduler.cancel('gravity')
+            scheduler.schedule('animation', MERGE_ANIM_DELAY, delay=0)
+
+      # render the grid (without pausing, the scheduler waits for the next task)
+      if scheduler.due('render'):
+         profiler.tick('frame')  # the time between the frames
+         grid.display(0)
+      scheduler.wait()
+
+def do_reset(engine):
+   # reset the game grid and create the first tetrominoes to enter it
+   engine.reset()
 
    # clear the queue of the pressed keys for a smoother interaction
    stddraw.clearKeysTyped()  # clear the queue of the pressed keys for a smoother interaction
 
-# A function for creating random shaped tetrominoes to enter the game grid
-def create_tetromino():
-   # the type (shape) of the tetromino is determined randomly
-   tetromino_types = ['I', 'O', 'Z', 'S', 'L', 'J', 'T']
-   random_index = random.randint(0, len(tetromino_types) - 1)
-   random_type = tetromino_types[random_index]
-   # create and return the tetromino
-   tetromino = Tetromino(random_type)
-   return tetromino
-
 def check_win_condition(current_score):
     return current_score >= 2048
 
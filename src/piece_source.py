@@ -0,0 +1,74 @@
+import random  # the random module is used for generating random values
+import collections  # used for buffering the upcoming tetromino types
+
+# the types (shapes) of the tetrominoes that can enter the game grid
+TETROMINO_TYPES = ('I', 'O', 'Z', 'S', 'L', 'J', 'T')
+
+# the number of tetromino types generated at once into the buffer
+BUFFER_SIZE = 256
+
+# A class for generating all the random values of a game (the types of the
+# tetrominoes, their horizontal positions and the numbers on their tiles) from
+# a single seed, so that a game played with the same seed and moves is always
+# the same. The types are drawn either independently (uniformly) or from a 7-bag
+# (a shuffled bag of all the 7 types, refilled when it is empty), and they are
+# generated in advance into a buffer so that the upcoming ones can be peeked.
+class PieceSource:
+   # A constructor for creating a source with the given seed (a random one when
+   # it is None) that draws the types from a 7-bag when bag is set
+   def __init__(self, seed=None, bag=False, buffer_size=BUFFER_SIZE):
+      self.seed = seed
+      self.bag = bag
+      self.buffer_size = buffer_size
+      # separate random generators are derived from the seed for the types and
+      # for the other values, so that the sequence of the types does not depend
+      # on how many other values are drawn
+      master = random.Random(seed)
+      self.type_rng = random.Random(master.getrandbits(64))
+      self.tile_rng = random.Random(master.getrandbits(64))
+      self._types = collections.deque()
+
+   # A method for generating the next buffer_size types into the buffer
+   def _fill(self):
+      if self.bag:
+         for _ in range(-(-self.buffer_size // len(TETROMINO_TYPES))):
+            bag = list(TETROMINO_TYPES)
+            self.type_rng.shuffle(bag)
+            self._types.extend(bag)
+      else:
+         self._types.extend(self.type_rng.choices(TETROMINO_TYPES,
+                                                  k=self.buffer_size))
+
+   # A method that returns the type of the next tetromino
+   def next_type(self):
+      if not self._types:
+         self._fill()
+      return self._types.popleft()
+
+   # A method that returns the types of the given number of upcoming
+   # tetrominoes without removing them
+   def peek(self, count):
+      while len(self._types) < count:
+         self._fill()
+      return [self._types[i] for i in range(count)]
+
+   # A method that returns the number on a new tile (4 with %10 chance,
+   # otherwise 2)
+   def tile_number(self):
+      return 4 if self.tile_rng.random() < 0.1 else 2
+
+   # A method that returns a random horizontal position for the bottom left
+   # cell of a new tetromino (from 0 to max_x, inclusive)
+   def spawn_column(self, max_x):
+      return self.tile_rng.randint(0, max_x)
+
+# the source used by the tetrominoes created without any source (with a random
+# seed, as the games are not reproducible without a seed)
+_default_source = None
+
+# A function that returns the source used when no source is given
+def get_default_source():
+   global _default_source
+   if _default_source is None:
+      _default_source = PieceSource()
+   return _default_source
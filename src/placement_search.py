@@ -0,0 +1,199 @@
+from cascade_resolver import get_cascade_resolver  # used for the cascades
+from tetromino import ROTATION_STATES  # the rotation states of the shapes
+from tile import number_to_exponent  # used for locking the tiles
+import collections  # used for the transposition table
+import numpy as np  # fundamental Python module for scientific computing
+
+# the weights of the features of the boards (see get_features) used for
+# scoring the placements; the score gained by a placement is added as it is
+DEFAULT_WEIGHTS = {
+   'holes': -40.0,  # the empty cells below the topmost tile of their column
+   'bumpiness': -4.0,  # the height differences of the adjacent columns
+   'height': -2.0,  # the total height of the columns
+   'max_height': -10.0,  # the height of the highest column
+   'monotonicity': -3.0,  # how much the tiles grow upwards in the columns
+   'merge_potential': 6.0,  # the columns that can absorb a new 2 or 4 tile
+}
+# the maximum number of boards whose values are kept in the transposition table
+CACHE_SIZE = 65536
+
+# A function that returns the height (the row of the bottom left cell) the
+# placements of the given tetromino are searched at on the given game grid. A
+# tetromino cannot be rotated while any of its tiles is above the game grid
+# (see Tetromino.can_be_rotated), so it first falls from its current height
+# as far as needed for all its rotation states to be inside the game grid (or
+# as far as it can fall when it cannot fall that far).
+def get_placement_height(game_grid, tetromino):
+   x, y = tetromino.bottom_left_cell.x, tetromino.bottom_left_cell.y
+   top_offset = max(state.n - 1 - state.min_row
+                    for state in ROTATION_STATES[tetromino.type])
+   lowest = game_grid.grid_height - 1 - top_offset
+   while y > lowest and tetromino.fits(game_grid, x, y - 1):
+      y -= 1
+   return y
+
+# A function that returns the placements of the given tetromino (the current
+# tetromino when it is not given) on the given game grid that can be reached by
+# moving it to the left and to the right and rotating it at the height given
+# by get_placement_height, as (rotation, x) pairs, i.e., rotation states and
+# horizontal positions of its bottom left cell (from which it can be dropped).
+# The moves and the rotations are checked as in Tetromino.move and
+# Tetromino.rotate_to. A tetromino entering on the tiles at the top of the
+# game grid does not fit where it is, but it can still be moved or rotated to
+# where it fits.
+def get_reachable_placements(game_grid, tetromino=None):
+   if tetromino is None:
+      tetromino = game_grid.current_tetromino
+   y = get_placement_height(game_grid, tetromino)
+   start = (tetromino.rotation, tetromino.bottom_left_cell.x)
+   placements = []
+   if tetromino.fits(game_grid, start[1], y, rotation=start[0]):
+      placements.append(start)
+   visited = {start}
+   # breadth first search over the moves and the rotations
+   queue = collections.deque([start])
+   while queue:
+      rotation, x = queue.popleft()
+      for neighbor, allow_above in (((rotation, x - 1), True),
+                                    ((rotation, x + 1), True),
+                                    (((rotation + 1) % 4, x), False),
+                                    (((rotation - 1) % 4, x), False)):
+         if neighbor in visited:
+            continue
+         if tetromino.fits(game_grid, neighbor[1], y, allow_above,
+                           rotation=neighbor[0]):
+            visited.add(neighbor)
+            placements.append(neighbor)
+            queue.append(neighbor)
+   return placements
+
+# A function that returns the features of the given board used for scoring
+# the placements (see DEFAULT_WEIGHTS) as a dictionary
+def get_features(board):
+   occupied = board != 0
+   grid_h = board.shape[0]
+   # the height of each column (the index of the row above its topmost tile)
+   from_top = np.argmax(occupied[::-1], axis=0)
+   heights = np.where(occupied.any(axis=0), grid_h - from_top, 0)
+   # the exponents of the topmost tiles of the columns (0 for empty columns)
+   tops = board[np.maximum(heights - 1, 0), np.arange(board.shape[1])]
+   tops = np.where(heights > 0, tops, 0)
+   # the tiles larger than the tiles below them (which cannot merge downwards)
+   lower = board[:-1].astype(np.int64)
+   upper = board[1:].astype(np.int64)
+   growth = np.where(occupied[:-1] & occupied[1:], upper - lower, 0)
+   return {
+      'holes': int(heights.sum() - np.count_nonzero(occupied)),
+      'bumpiness': int(np.abs(np.diff(heights)).sum()),
+      'height': int(heights.sum()),
+      'max_height': int(heights.max()),
+      'monotonicity': int(np.maximum(growth, 0).sum()),
+      'merge_potential': int(np.count_nonzero((tops == 1) | (tops == 2))),
+   }
+
+# A class for choosing the placements of the tetrominoes by simulating every
+# reachable placement of the current tetromino (locking it on a copy of the
+# board and resolving the cascade of merges, line clears and free tiles with
+# a CascadeResolver, which keeps the cascades found before) and
+# scoring the resulting boards with a weighted sum of their features. The
+# values of the boards are kept in a bounded transposition table (evicting the
+# least recently used ones) by their Zobrist hashes (see zobrist.py), as the
+# same boards are reached again and again.
+class PlacementSearch:
+   # A constructor for creating a search for game grids with the given
+   # dimensions and with the given feature weights (DEFAULT_WEIGHTS for the
+   # features that are not given)
+   def __init__(self, grid_h=20, grid_w=12, weights=None, cache_size=CACHE_SIZE):
+      self.weights = dict(DEFAULT_WEIGHTS)
+      if weights is not None:
+         self.weights.update(weights)
+      self.cache_size = cache_size
+      # the resolver of the cascades (shared with the games on the game grids
+      # with the same dimensions) and the board the tetrominoes are locked on
+      self.resolver = get_cascade_resolver(grid_h, grid_w)
+      self.locked_board = np.zeros((grid_h, grid_w), dtype=np.uint8)
+      # the values of the boards by their hashes and the numbers of the found
+      # and the missing boards in the table
+      self.table = collections.OrderedDict()
+      self.hits, self.misses = 0, 0
+
+   # A method that returns the value of the given board with the given hash (a
+   # weighted sum of its features) from the transposition table, computing it
+   # when it is missing
+   def evaluate(self, board, key):
+      value = self.table.get(key)
+      if value is not None:
+         self.table.move_to_end(key)
+         self.hits += 1
+         return value
+      self.misses += 1
+      features = get_features(board)
+      value = sum(self.weights[name] * features[name] for name in self.weights)
+      self.table[key] = value
+      if len(self.table) > self.cache_size:
+         self.table.popitem(last=False)
+      return value
+
+   # A method that drops the given tetromino on (a copy of the board of) the
+   # given game grid in the given rotation state from the given position,
+   # locks it and resolves the cascade. Returns the resulting board, its
+   # hash, the score gained and whether the game is over (None for the
+   # others when the game is over).
+   def simulate(self, game_grid, tetromino, rotation, x, y):
+      state = ROTATION_STATES[tetromino.type][rotation]
+      y -= tetromino.get_drop_distance(game_grid, x, rotation, y)
+      board = self.locked_board
+      board[...] = game_grid.board
+      rows, cols, values = [], [], []
+      for tile, (row, col) in zip(tetromino.tiles, state.cells):
+         tile_row = y + (state.n - 1) - row
+         if tile_row >= game_grid.grid_height:
+            return None, None, None, True
+         rows.append(tile_row)
+         cols.append(x + col)
+         values.append(number_to_exponent(tile.number))
+      board[rows, cols] = values
+      # the hash of the board is updated for the cells of the locked tiles
+      board_hash = self.resolver.zobrist.toggle(game_grid.board_hash, rows,
+                                                cols, values)
+      cascade = self.resolver.resolve(board, board_hash)
+      return cascade.board, cascade.board_hash, cascade.gained, False
+
+   # A method that returns the best placement of the current tetromino of the
+   # given game grid as (rotation, x) and its value (both None when no
+   # placement is possible)
+   def search(self, game_grid):
+      tetromino = game_grid.current_tetromino
+      y = get_placement_height(game_grid, tetromino)
+      best, best_value = None, None
+      for rotation, x in get_reachable_placements(game_grid, tetromino):
+         board, key, gained, game_over = self.simulate(game_grid, tetromino,
+                                                       rotation, x, y)
+         if game_over:
+            value = float('-inf')
+         else:
+            value = gained + self.evaluate(board, key)
+         if best_value is None or value > best_value:
+            best, best_value = (rotation, x), value
+      return best, best_value
+
+   # A method that returns the best placement of the current tetromino of the
+   # given game grid as (rotation, x) (None when no placement is possible)
+   def best_placement(self, game_grid):
+      return self.search(game_grid)[0]
+
+# A policy for the self-play runner (see self_play.py) that places each
+# tetromino at the best placement found by a PlacementSearch
+class SearchPolicy:
+   # A constructor for creating the policy for the game with the given seed
+   # (the search is deterministic, so the seed is not used)
+   def __init__(self, seed=None):
+      self.search = None
+
+   # A method that returns the placement of the current tetromino of the given
+   # engine as (rotation, x) (None when no placement is possible)
+   def __call__(self, engine):
+      grid = engine.grid
+      if self.search is None:
+         self.search = PlacementSearch(grid.grid_height, grid.grid_width)
+      return self.search.best_placement(grid)
@@ -0,0 +1,166 @@
+import os  # the os module is used for reading the environment variables
+import csv  # used for saving the timings as a CSV file
+import json  # used for saving the timings as a JSON file
+import time  # used for timing the phases
+import atexit  # used for saving the timings when the program exits
+import collections  # used for keeping the most recent timings
+import contextlib  # used for timing the phases in with statements
+import numpy as np  # fundamental Python module for scientific computing
+
+# the environment variable that enables the profiler; its value is the path of
+# the file the timings are saved to at exit (a CSV file when the path ends with
+# .csv and a JSON file otherwise) or 1 for saving them to DEFAULT_PATH (the
+# profiler is disabled when it is not set, empty or 0)
+PROFILE_ENV = "TETRIS_PROFILE"
+DEFAULT_PATH = "profile.json"
+# the number of the most recent timings the percentiles are computed from
+WINDOW = 600
+# the minimum time between the updates of the overlay lines in nanoseconds
+OVERLAY_INTERVAL = 500 * 1000 * 1000
+# the percentiles given for each phase
+PERCENTILES = (50, 95, 99)
+
+# A class for timing the phases of the game loop (e.g. the input handling, the
+# gravity ticks, the cascades and the rendering) with time.perf_counter_ns and
+# keeping the most recent timings of each phase for computing its percentiles
+class PhaseProfiler:
+   enabled = True
+
+   # A constructor for creating a profiler keeping the given number of the
+   # most recent timings of each phase
+   def __init__(self, window=WINDOW):
+      self.window = window
+      # the most recent timings, the number of timings, the total and the
+      # maximum time of each phase (in nanoseconds)
+      self.timings = {}
+      self.counts, self.totals, self.maximums = {}, {}, {}
+      # the end times of the phases timed by tick()
+      self.last_ticks = {}
+      # the lines drawn on the overlay and the time they were computed at
+      self.overlay_lines, self.overlay_time = [], None
+
+   # A method that returns the start time for the phase timed by stop()
+   def start(self):
+      return time.perf_counter_ns()
+
+   # A method for adding the time passed since the given start time (returned
+   # by start()) to the timings of the phase with the given name
+   def stop(self, name, start):
+      self.add(name, time.perf_counter_ns() - start)
+
+   # A method that returns a context manager timing the phase with the given
+   # name (used in with statements)
+   @contextlib.contextmanager
+   def phase(self, name):
+      start = time.perf_counter_ns()
+      try:
+         yield
+      finally:
+         self.add(name, time.perf_counter_ns() - start)
+
+   # A method for adding the time passed since the previous call with the same
+   # name to the timings of the phase with that name (e.g. the frame times)
+   def tick(self, name):
+      now = time.perf_counter_ns()
+      last = self.last_ticks.get(name)
+      self.last_ticks[name] = now
+      if last is not None:
+         self.add(name, now - last)
+
+   # A method for adding the given time in nanoseconds to the timings of the
+   # phase with the given name
+   def add(self, name, duration):
+      timings = self.timings.get(name)
+      if timings is None:
+         timings = self.timings[name] = collections.deque(maxlen=self.window)
+         self.counts[name], self.totals[name], self.maximums[name] = 0, 0, 0
+      timings.append(duration)
+      self.counts[name] += 1
+      self.totals[name] += duration
+      if duration > self.maximums[name]:
+         self.maximums[name] = duration
+
+   # A method that returns the statistics of each phase in milliseconds: the
+   # number of timings, the mean and the maximum time of all the timings and
+   # the percentiles of the most recent timings
+   def summary(self):
+      result = {}
+      for name, timings in self.timings.items():
+         count = self.counts[name]
+         stats = {"count": count,
+                  "mean_ms": self.totals[name] / count / 1e6,
+                  "max_ms": self.maximums[name] / 1e6}
+         values = np.percentile(np.fromiter(timings, dtype=np.int64), PERCENTILES)
+         for p, value in zip(PERCENTILES, values):
+            stats["p%d_ms" % p] = float(value) / 1e6
+         result[name] = stats
+      return result
+
+   # A method that returns the lines drawn on the overlay showing the p50, p95
+   # and p99 times of each phase (recomputed at most once per OVERLAY_INTERVAL)
+   def get_overlay_lines(self):
+      now = time.perf_counter_ns()
+      if self.overlay_time is None or now - self.overlay_time >= OVERLAY_INTERVAL:
+         self.overlay_time = now
+         self.overlay_lines = ["%s %.1f/%.1f/%.1f" % (
+            name, stats["p50_ms"], stats["p95_ms"], stats["p99_ms"])
+            for name, stats in sorted(self.summary().items())]
+      return self.overlay_lines
+
+   # A method for saving the statistics of each phase to the file at the
+   # given path (as CSV when the path ends with .csv and as JSON otherwise)
+   def save(self, path):
+      summary = self.summary()
+      if path.lower().endswith(".csv"):
+         fields = ["count", "mean_ms"] + ["p%d_ms" % p for p in PERCENTILES] \
+            + ["max_ms"]
+         with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["phase"] + fields)
+            for name, stats in sorted(summary.items()):
+               writer.writerow([name] + [stats[field] for field in fields])
+      else:
+         with open(path, "w") as f:
+            json.dump(summary, f, indent=2, sort_keys=True)
+
+# A class for the profiler used when profiling is not enabled, whose methods do
+# nothing so that the phases can be timed unconditionally
+class NullProfiler:
+   enabled = False
+
+   def start(self):
+      return 0
+
+   def stop(self, name, start):
+      pass
+
+   def phase(self, name):
+      return contextlib.nullcontext()
+
+   def tick(self, name):
+      pass
+
+   def add(self, name, duration):
+      pass
+
+   def get_overlay_lines(self):
+      return []
+
+# the profiler returned by get_profiler (created when it is first called)
+_profiler = None
+
+# A function that returns the profiler of the game, which is a PhaseProfiler
+# saving its timings at exit when the PROFILE_ENV environment variable is set
+# and a NullProfiler otherwise
+def get_profiler():
+   global _profiler
+   if _profiler is None:
+      path = os.environ.get(PROFILE_ENV, "")
+      if path not in ("", "0"):
+         _profiler = PhaseProfiler()
+         if path == "1":
+            path = DEFAULT_PATH
+         atexit.register(_profiler.save, path)
+      else:
+         _profiler = NullProfiler()
+   return _profiler
@@ -0,0 +1,138 @@
+################################################################################
+#                                                                              #
+# Self-play runner of Tetris 2048: plays headless games with a policy on all   #
+# the cores and writes the statistics of each game as a line of JSON          #
+#                                                                              #
+# Usage: python self_play.py --games 1000 --policy random --output games.jsonl #
+#                                                                              #
+################################################################################
+
+import os  # the os module is used for finding the number of cores
+import sys  # used for printing the summary
+import json  # used for writing the statistics of the games
+import time  # used for timing the games
+import random  # used for the random policy
+import argparse  # used for parsing the command line arguments
+import importlib  # used for loading the policies given as module:name
+import multiprocessing  # used for playing the games on all the cores
+import numpy as np  # fundamental Python module for scientific computing
+from game_engine import GameEngine  # the class for applying the game rules
+from placement_search import SearchPolicy  # the policy searching placements
+
+# A policy that places each tetromino at one of its placements chosen randomly
+class RandomPolicy:
+   # A constructor for creating the policy for the game with the given seed
+   def __init__(self, seed):
+      self.rng = random.Random(seed)
+
+   # A method that returns the placement of the current tetromino of the given
+   # engine as (rotation, x) (see GameEngine.get_placements), or None when no
+   # placement is possible
+   def __call__(self, engine):
+      placements = engine.get_placements()
+      return self.rng.choice(placements) if placements else None
+
+# The policies that can be given by name. A policy is created for each game by
+# calling its factory with the seed of the game and called with the engine for
+# each tetromino, returning the placement of the current tetromino (or None
+# when the tetromino cannot be placed anywhere, which ends the game). A policy
+# can also be given as module:name, where name is its factory in the module.
+POLICIES = {
+   'random': RandomPolicy,
+   'search': SearchPolicy,
+}
+
+# A function that returns the factory of the policy with the given name
+def get_policy_factory(name):
+   if name in POLICIES:
+      return POLICIES[name]
+   if ':' not in name:
+      raise ValueError('unknown policy: ' + name)
+   module_name, factory_name = name.split(':', 1)
+   return getattr(importlib.import_module(module_name), factory_name)
+
+# A function that plays a game with the given seed and policy (by name) until
+# the game is over or max_pieces tetrominoes are placed, and returns the
+# statistics of the game
+def play_game(seed, policy_name, grid_h=20, grid_w=12, max_pieces=None, bag=False):
+   start = time.perf_counter()
+   engine = GameEngine(grid_h, grid_w, seed=seed, bag=bag)
+   policy = get_policy_factory(policy_name)(seed)
+   while max_pieces is None or engine.pieces_placed < max_pieces:
+      placement = policy(engine)
+      if placement is None:
+         # the tetromino entered on the tiles at the top of the game grid
+         engine.grid.game_over = True
+         break
+      if not engine.place(*placement):
+         break
+   return {"seed": seed, "policy": policy_name, "score": engine.grid.score,
+           "max_tile": engine.get_max_tile(),
+           "pieces_placed": engine.pieces_placed,
+           "lines_cleared": engine.lines_cleared, "merges": engine.merges,
+           "game_over": engine.grid.game_over,
+           "wall_time": time.perf_counter() - start}
+
+# A function that plays the game given as a tuple of the arguments of play_game
+# (used by the worker processes)
+def _play_task(task):
+   return play_game(*task)
+
+# A function that returns the summary of the statistics of the given games
+def summarize(results, wall_time):
+   summary = {"games": len(results),
+              "games_per_second": len(results) / wall_time if wall_time > 0 else 0.0}
+   if not results:
+      return summary
+   scores = np.array([result["score"] for result in results])
+   max_tiles = {}
+   for result in results:
+      max_tiles[result["max_tile"]] = max_tiles.get(result["max_tile"], 0) + 1
+   summary.update({
+      "mean_score": float(scores.mean()),
+      "median_score": float(np.median(scores)),
+      "best_score": int(scores.max()),
+      "max_tiles": {str(tile): count for tile, count in sorted(max_tiles.items())},
+      "mean_pieces": float(np.mean([result["pieces_placed"] for result in results])),
+   })
+   return summary
+
+# The main function where this program starts execution
+def main():
+   parser = argparse.ArgumentParser(description="Play headless games of "
+                                    "Tetris 2048 with a policy on all the cores.")
+   parser.add_argument("--games", type=int, default=100,
+                       help="the number of games to play")
+   parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                       help="the number of worker processes")
+   parser.add_argument("--seed", type=int, default=0,
+                       help="the seed of the first game (game i is played "
+                       "with seed + i)")
+   parser.add_argument("--policy", default="random",
+                       help="the policy: one of %s or module:name" % ", ".join(POLICIES))
+   parser.add_argument("--max-pieces", type=int, default=None,
+                       help="stop each game after this many tetrominoes")
+   parser.add_argument("--bag", action="store_true",
+                       help="draw the tetromino types from 7-bags")
+   parser.add_argument("--grid-height", type=int, default=20)
+   parser.add_argument("--grid-width", type=int, default=12)
+   parser.add_argument("--output", default="self_play.jsonl",
+                       help="the file the statistics of the games are written to")
+   args = parser.parse_args()
+   get_policy_factory(args.policy)  # fail early for an unknown policy
+
+   tasks = [(args.seed + i, args.policy, args.grid_height, args.grid_width,
+             args.max_pieces, args.bag) for i in range(args.games)]
+   results = []
+   start = time.perf_counter()
+   with open(args.output, "w") as f, multiprocessing.Pool(args.workers) as pool:
+      # the statistics are written as soon as each game is over
+      for result in pool.imap_unordered(_play_task, tasks):
+         f.write(json.dumps(result) + "\n")
+         f.flush()
+         results.append(result)
+   summary = summarize(results, time.perf_counter() - start)
+   print(json.dumps(summary, indent=2), file=sys.stderr)
+
+if __name__ == "__main__":
+   main()
@@ -1,89 +1,113 @@
 from tile import Tile  # used for modeling each tile on the tetrominoes
 from point import Point  # used for tile positions
+from piece_source import get_default_source  # used for the random values
 import copy as cp  # the copy module is used for copying tiles and positions
-import random  # the random module is used for generating random values
 import numpy as np  # the fundamental Python module for scientific computing
 
+# The size of the tile matrix (n = number of rows = number of columns) and the
+# occupied (non-empty) cells in the tile matrix as (column_index, row_index)
+# for each shape (type) of the tetrominoes in its initial rotation state
+# (see the documentation given with this code)
+SHAPES = {
+   'I': (4, ((1, 0), (1, 1), (1, 2), (1, 3))),
+   'O': (2, ((0, 0), (1, 0), (0, 1), (1, 1))),
+   'Z': (3, ((0, 1), (1, 1), (1, 2), (2, 2))),
+   'S': (3, ((1, 1), (2, 1), (0, 2), (1, 2))),
+   'J': (3, ((0, 0), (0, 1), (1, 1), (2, 1))),
+   'L': (3, ((2, 0), (0, 1), (1, 1), (2, 1))),
+   'T': (3, ((1, 0), (0, 1), (1, 1), (2, 1))),
+}
+
+# A class for modeling one of the 4 rotation states of a tetromino shape with
+# the values used for placing, moving and drawing the tetrominoes in it
+class RotationState:
+   # A constructor that computes the values for the given size of the tile
+   # matrix and the occupied cells as (row_index, column_index) in tile order
+   def __init__(self, n, cells):
+      self.n = n  # n = number of rows = number of columns in the tile matrix
+      self.cells = cells
+      # the bounding box of the occupied cells in the tile matrix
+      rows = [row for row, col in cells]
+      cols = [col for row, col in cells]
+      self.min_row, self.max_row = min(rows), max(rows)
+      self.min_col, self.max_col = min(cols), max(cols)
+      # the bitmasks of the occupied cells in each row of the tile matrix (bit
+      # c is set when column c is occupied) with the vertical offsets of the
+      # rows from the bottom row of the tile matrix
+      masks = {}
+      for row, col in cells:
+         masks[(n - 1) - row] = masks.get((n - 1) - row, 0) | (1 << col)
+      self.row_masks = tuple(sorted(masks.items()))
+      # the vertical offset of the bottommost occupied cell of each column
+      bottom = {}
+      for row, col in cells:
+         bottom[col] = min(bottom.get(col, n), (n - 1) - row)
+      self.bottom_profile = tuple(sorted(bottom.items()))
+
+# A function that computes the 4 rotation states of a tetromino shape, where
+# rotation state k is the initial state rotated clockwise by 90 degrees k
+# times (each tile keeps its index in the cells of all the rotation states)
+def compute_rotation_states(n, occupied_cells):
+   cells = tuple((row, col) for col, row in occupied_cells)
+   states = []
+   for k in range(4):
+      states.append(RotationState(n, cells))
+      # rotating the tile matrix clockwise moves the cell (row, col) to the
+      # cell (col, n - 1 - row)
+      cells = tuple((col, n - 1 - row) for row, col in cells)
+   return tuple(states)
+
+# The rotation states of all the tetromino shapes (computed once and shared by
+# all the tetrominoes, so that rotating a tetromino only changes an index)
+ROTATION_STATES = {shape: compute_rotation_states(n, occupied_cells)
+                   for shape, (n, occupied_cells) in SHAPES.items()}
+
 # A class for modeling tetrominoes with 7 different types: I, O, Z, S, J, L and T
 class Tetromino:
    # the dimensions of the game grid (defined as class variables)
    grid_height, grid_width = None, None
 
-   # A constructor for creating a tetromino with a given shape (type)
-   def __init__(self, shape):
+   # A constructor for creating a tetromino with a given shape (type), whose
+   # random values are drawn from the given piece source (the default source
+   # when it is not given)
+   def __init__(self, shape, source=None):
+      if source is None:
+         source = get_default_source()
       self.type = shape  # set the type of this tetromino
-      # determine the occupied (non-empty) cells in the tile matrix based on
-      # the shape of this tetromino (see the documentation given with this code)
-      occupied_cells = []
-      if self.type == 'I':
-         n = 4  # n = number of rows = number of columns in the tile matrix
-         # shape of the tetromino I in its initial rotation state
-         occupied_cells.append((1, 0))  # (column_index, row_index)
-         occupied_cells.append((1, 1))
-         occupied_cells.append((1, 2))
-         occupied_cells.append((1, 3))
-      elif self.type == 'O':
-         n = 2  # n = number of rows = number of columns in the tile matrix
-         # shape of the tetromino O in its initial rotation state
-         occupied_cells.append((0, 0))  # (column_index, row_index)
-         occupied_cells.append((1, 0))
-         occupied_cells.append((0, 1))
-         occupied_cells.append((1, 1))
-      elif self.type == 'Z':
-         n = 3  # n = number of rows = number of columns in the tile matrix
-         # shape of the tetromino Z in its initial rotation state
-         occupied_cells.append((0, 1))  # (column_index, row_index)
-         occupied_cells.append((1, 1))
-         occupied_cells.append((1, 2))
-         occupied_cells.append((2, 2))
-      elif self.type == 'S':
-         n = 3  # n = number of rows = number of columns in the tile matrix
-         # shape of the tetromino S in its initial rotation state
-         occupied_cells.append((1, 1))
-         occupied_cells.append((2, 1))
-         occupied_cells.append((0, 2))
-         occupied_cells.append((1, 2))
-      elif self.type == 'J':
-         n = 3
-         # shape of the tetromino J in its initial rotation state
-         occupied_cells.append((0, 0))
-         occupied_cells.append((0, 1))
-         occupied_cells.append((1, 1))
-         occupied_cells.append((2, 1))
-      elif self.type == 'L':
-         n = 3
-         # shape of the tetromino L in its initial rotation state
-         occupied_cells.append((2, 0))
-         occupied_cells.append((0, 1))
-         occupied_cells.append((1, 1))
-         occupied_cells.append((2, 1))
-      elif self.type == 'T':
-         n = 3
-         # shape of the tetromino T in its initial rotation state
-         occupied_cells.append((1, 0))
-         occupied_cells.append((0, 1))
-         occupied_cells.append((1, 1))
-         occupied_cells.append((2, 1))
-      # create a matrix of numbered tiles based on the shape of this tetromino
-      self.tile_matrix = np.full((n, n), None)
-      # create the four tiles (minos) of this tetromino and place these tiles
-      # into the tile matrix
-      for i in range(len(occupied_cells)):
-         col_index, row_index = occupied_cells[i][0], occupied_cells[i][1]
+      # the index of the current rotation state of this tetromino
+      self.rotation = 0
+      n = self.state.n  # n = number of rows = number of columns
+      # create the four tiles (minos) of this tetromino in the order of the
+      # occupied cells given in the rotation states
+      self.tiles = []
+      for i in range(len(self.state.cells)):
          # pick 4 with %10 change, otherwise 2
-         tile_number = 4 if random.random() < 0.1 else 2
-         # create a tile for each occupied cell of this tetromino
-         self.tile_matrix[row_index][col_index] = Tile(tile_number)
+         self.tiles.append(Tile(source.tile_number()))
       # initialize the position of this tetromino (as the bottom left cell in
       # the tile matrix) with a random horizontal position above the game grid
       self.bottom_left_cell = Point()
       self.bottom_left_cell.y = Tetromino.grid_height - 1
-      self.bottom_left_cell.x = random.randint(0, Tetromino.grid_width - n)
+      self.bottom_left_cell.x = source.spawn_column(Tetromino.grid_width - n)
+
+   # A property that returns the current rotation state of this tetromino
+   @property
+   def state(self):
+      return ROTATION_STATES[self.type][self.rotation]
+
+   # A property that returns the tile matrix of this tetromino in its current
+   # rotation state (None for the empty cells)
+   @property
+   def tile_matrix(self):
+      n = self.state.n  # n = number of rows = number of columns
+      tile_matrix = np.full((n, n), None)
+      for tile, (row, col) in zip(self.tiles, self.state.cells):
+         tile_matrix[row][col] = tile
+      return tile_matrix
 
    # A method that computes and returns the position of the cell in the tile
    # matrix specified by the given row and column indexes
    def get_cell_position(self, row, col):
-      n = len(self.tile_matrix)  # n = number of rows = number of columns
+      n = self.state.n  # n = number of rows = number of columns
       position = Point()
       # horizontal position of the cell
       position.x = self.bottom_left_cell.x + col
@@ -94,28 +118,16 @@ class Tetromino:
    # A method to return a copy of the tile matrix without any empty row/column,
    # and the position of the bottom left cell when return_position is set
    def get_min_bounded_tile_matrix(self, return_position=False):
-      n = len(self.tile_matrix)  # n = number of rows = number of columns
-      # determine rows and columns to copy (omit empty rows and columns)
-      min_row, max_row, min_col, max_col = n - 1, 0, n - 1, 0
-      for row in range(n):
-         for col in range(n):
-            if self.tile_matrix[row][col] is not None:
-               if row < min_row:
-                  min_row = row
-               if row > max_row:
-                  max_row = row
-               if col < min_col:
-                  min_col = col
-               if col > max_col:
-                  max_col = col
+      state = self.state
+      n = state.n  # n = number of rows = number of columns
+      # the rows and columns to copy (omitting empty rows and columns) are
+      # given by the bounding box of the rotation state
+      min_row, max_row = state.min_row, state.max_row
+      min_col, max_col = state.min_col, state.max_col
       # copy the tiles from the tile matrix of this tetromino
       copy = np.full((max_row - min_row + 1, max_col - min_col + 1), None)
-      for row in range(min_row, max_row + 1):
-         for col in range(min_col, max_col + 1):
-            if self.tile_matrix[row][col] is not None:
-               row_ind = row - min_row
-               col_ind = col - min_col
-               copy[row_ind][col_ind] = cp.deepcopy(self.tile_matrix[row][col])
+      for tile, (row, col) in zip(self.tiles, state.cells):
+         copy[row - min_row][col - min_col] = cp.copy(tile)
       # return just the matrix copy when return_position is not set (as True)
       # the argument return_position defaults to False when a value is not given
       if not return_position:
@@ -126,21 +138,21 @@ class Tetromino:
          blc_position.translate(min_col, (n - 1) - max_row)
          return copy, blc_position
 
-   # A method for drawing the tetromino on the game grid
-   def draw(self, pred = False, next_display=False):
-      n = len(self.tile_matrix)  # n = number of rows = number of columns
-      for row in range(n):
-         for col in range(n):
-            # draw each occupied cell as a tile on the game grid
-            if self.tile_matrix[row][col] is not None:
-               # get the position of the tile
-               position = self.get_cell_position(row, col)
-
-               if next_display:
-                  self.tile_matrix[row][col].draw(position, is_next=True)
-               # draw only the tiles that are inside the game grid
-               if position.y < Tetromino.grid_height:
-                  self.tile_matrix[row][col].draw(position, is_pred=pred)
+   # A method for drawing the tetromino on the game grid (with its bottom left
+   # cell at the given position instead of its own one when bottom_left is set)
+   def draw(self, pred = False, next_display=False, bottom_left=None):
+      if bottom_left is None:
+         bottom_left = self.bottom_left_cell
+      n = self.state.n  # n = number of rows = number of columns
+      for tile, (row, col) in zip(self.tiles, self.state.cells):
+         # get the position of the tile
+         position = Point(bottom_left.x + col, bottom_left.y + (n - 1) - row)
+
+         if next_display:
+            tile.draw(position, is_next=True)
+         # draw only the tiles that are inside the game grid
+         if position.y < Tetromino.grid_height:
+            tile.draw(position, is_pred=pred)
 
    # A method for moving this tetromino in a given direction by 1 on the grid
    def move(self, direction, game_grid):
@@ -157,99 +169,92 @@ class Tetromino:
          self.bottom_left_cell.y -= 1
       return True  # a successful move in the given direction
 
+   # A method that returns the number of rows this tetromino can be moved down
+   # on the game grid, which is the smallest distance between the bottommost
+   # tile of a column of this tetromino and the topmost tile below it (from
+   # the given position and in the given rotation state instead of its own
+   # ones when they are given)
+   def get_drop_distance(self, game_grid, x=None, rotation=None, y=None):
+      if x is None:
+         x = self.bottom_left_cell.x
+      if rotation is None:
+         rotation = self.rotation
+      if y is None:
+         y = self.bottom_left_cell.y
+      distance = None
+      for col, dy in ROTATION_STATES[self.type][rotation].bottom_profile:
+         bottom = y + dy
+         col_distance = bottom - game_grid.get_column_height(x + col, bottom)
+         if distance is None or col_distance < distance:
+            distance = col_distance
+      return distance
+
+   # A method for moving this tetromino down as far as possible on the game
+   # grid (returns the number of rows the tetromino is moved down)
+   def drop(self, game_grid):
+      distance = self.get_drop_distance(game_grid)
+      self.bottom_left_cell.y -= distance
+      return distance
+
+   # A method for checking if the tiles of this tetromino would be placed on
+   # empty cells with its bottom left cell at the given position, in its
+   # current rotation state or in the given one; the tiles above the game grid
+   # are allowed only when allow_above is set
+   def fits(self, game_grid, x, y, allow_above=True, rotation=None):
+      if rotation is None:
+         rotation = self.rotation
+      state = ROTATION_STATES[self.type][rotation]
+      # the tiles must be between the left and the right sides of the grid
+      if x + state.min_col < 0 or x + state.max_col >= game_grid.grid_width:
+         return False
+      for dy, mask in state.row_masks:
+         row = y + dy
+         # the tiles cannot go below the bottom of the grid
+         if row < 0:
+            return False
+         if row >= game_grid.grid_height:
+            if not allow_above:
+               return False
+            continue  # the cells above the grid are never occupied
+         # shift the row of the tile matrix to its columns on the grid
+         shifted = mask << x if x >= 0 else mask >> -x
+         if game_grid.row_masks[row] & shifted:
+            return False
+      return True
+
    # A method for checking if this tetromino can be moved in a given direction
+   # (as this tetromino is always on empty cells, it can be moved when it fits
+   # at the moved position)
    def can_be_moved(self, direction, game_grid):
-      n = len(self.tile_matrix)  # n = number of rows = number of columns
-      # check for moving left or right
-      if direction == "left" or direction == "right":
-         for row_index in range(n):
-            for col_index in range(n):
-               # direction = left --> check the leftmost tile of each row
-               row, col = row_index, col_index
-               if direction == "left" and self.tile_matrix[row][col] is not None:
-                  # the position of the leftmost tile of the current row
-                  leftmost = self.get_cell_position(row, col)
-                  # if any leftmost tile is at x = 0
-                  if leftmost.x == 0:
-                     return False  # this tetromino cannot be moved left
-                  # if the grid cell on the left of a leftmost tile is occupied
-                  if game_grid.is_occupied(leftmost.y, leftmost.x - 1):
-                     return False  # this tetromino cannot be moved left
-                  # as the leftmost tile of the current row is checked
-                  break  # end the inner for loop
-               # direction = right --> check the rightmost tile of each row
-               row, col = row_index, n - 1 - col_index
-               if direction == "right" and self.tile_matrix[row][col] is not None:
-                  # the position of the rightmost tile of the current row
-                  rightmost = self.get_cell_position(row, col)
-                  # if any rightmost tile is at x = grid_width - 1
-                  if rightmost.x == Tetromino.grid_width - 1:
-                     return False  # this tetromino cannot be moved right
-                  # if the grid cell on the right of a rightmost tile is occupied
-                  if game_grid.is_occupied(rightmost.y, rightmost.x + 1):
-                     return False  # this tetromino cannot be moved right
-                  # as the rightmost tile of the current row is checked
-                  break  # end the inner for loop
-      # direction = down --> check the bottommost tile of each column
-      else:
-         for col in range(n):
-            for row in range(n - 1, -1, -1):
-               # if the current cell of the tetromino is occupied by a tile
-               if self.tile_matrix[row][col] is not None:
-                  # the position of the bottommost tile of the current col
-                  bottommost = self.get_cell_position(row, col)
-                  # if any bottommost tile is at y = 0
-                  if bottommost.y == 0:
-                     return False  # this tetromino cannot be moved down
-                  # if the grid cell below any bottommost tile is occupied
-                  if game_grid.is_occupied(bottommost.y - 1, bottommost.x):
-                     return False  # this tetromino cannot be moved down
-                  # as the bottommost tile of the current row is checked
-                  break  # end the inner for loop
-      # if this method does not end by returning False before this line
-      return True  # this tetromino can be moved in the given direction
-   
-   # A method for checking if this tetromino can be rotated on the game grid
-   def can_be_rotated(self, game_grid):
-      compact_matrix, blc_position = self.get_min_bounded_tile_matrix(True)
-      n_rows, n_cols = len(compact_matrix), len(compact_matrix[0])
-      for col in range(n_cols):
-         for row in range(n_rows):            
-            # place each tile onto the game grid
-            if compact_matrix[row][col] is not None:
-               # compute the position of the tile on the game grid
-               pos = Point()
-               pos.x = blc_position.x + col
-               pos.y = blc_position.y + (n_rows - 1) - row
-               if not game_grid.is_inside(pos.y, pos.x):
-                  return False
-               if game_grid.tile_matrix[pos.y][pos.x] is not None:
-                  return False
-      return True
-   
+      x, y = self.bottom_left_cell.x, self.bottom_left_cell.y
+      if direction == "left":
+         return self.fits(game_grid, x - 1, y)
+      if direction == "right":
+         return self.fits(game_grid, x + 1, y)
+      # direction = down
+      return self.fits(game_grid, x, y - 1)
+
+   # A method for checking if this tetromino can be in its current rotation
+   # state or in the given one on the game grid (all the tiles must be inside
+   # the grid and on empty cells)
+   def can_be_rotated(self, game_grid, rotation=None):
+      x, y = self.bottom_left_cell.x, self.bottom_left_cell.y
+      return self.fits(game_grid, x, y, allow_above=False, rotation=rotation)
+
    # A method for rotating this tetromino clockwise by 90 degrees
    def rotate_clockwise(self, game_grid):
-      # rotate the tile matrix of this tetromino clockwise by 90 degrees
-      self.tile_matrix = np.rot90(self.tile_matrix, -1)
-       # check if the tetromino can be rotated or not
-      if not self.can_be_rotated(game_grid):
-         # if the tetromino cannot be rotated, rotate it back to its original
-         # position by rotating it counter-clockwise by 90 degrees
-         self.tile_matrix = np.rot90(self.tile_matrix, 1)
-         return False
-      # otherwise return True to indicate a successful rotation
-      return True
+      return self.rotate_to((self.rotation + 1) % 4, game_grid)
 
    # A method for rotating this tetromino counter-clockwise by 90 degrees
    def rotate_counter_clockwise(self, game_grid):
-      # rotate the tile matrix of this tetromino counter-clockwise by 90 degrees
-      self.tile_matrix = np.rot90(self.tile_matrix, 1)
+      return self.rotate_to((self.rotation - 1) % 4, game_grid)
+
+   # A method for changing the rotation state of this tetromino to the given
+   # one when the tetromino can be rotated (returns True on success)
+   def rotate_to(self, rotation, game_grid):
       # check if the tetromino can be rotated or not
-      if not self.can_be_rotated(game_grid):
-         # if the tetromino cannot be rotated, rotate it back to its original
-         # position by rotating it clockwise by 90 degrees
-         self.tile_matrix = np.rot90(self.tile_matrix, -1)
+      if not self.can_be_rotated(game_grid, rotation):
          return False
-      # otherwise return True to indicate a successful rotation
+      self.rotation = rotation
+      # return True to indicate a successful rotation
       return True
-
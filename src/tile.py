@@ -1,5 +1,8 @@
-import lib.stddraw as stddraw  # used for drawing the tiles to display them
 import lib.color as color
+from lazy_module import LazyModule  # used for importing stddraw lazily
+
+# the drawing library (imported when a tile is first drawn, see lazy_module.py)
+stddraw = LazyModule('lib.stddraw')
 
 # A class for modeling numbered tiles as in 2048
 class Tile:
@@ -9,6 +12,9 @@ class Tile:
    boundary_thickness = 0.004
    # font family and font size used for displaying the tile number
    font_family, font_size = "Arial", 14
+   # the sprites of the drawn tiles keyed by the tile number, the drawing mode
+   # (is_next and is_pred) and the size of the tile in pixels
+   sprites = {}
 
    # A constructor that creates a tile with 2 as the number on it
    def __init__(self, number=2):
@@ -35,8 +41,24 @@ class Tile:
       self.box_color = color.LINE_COLOR
 
 
-   # A method for drawing this tile at a given position with a given length
+   # A method for drawing this tile at a given position with a given length.
+   # The first drawing of each number, mode (normal, next or prediction) and
+   # size in pixels is captured as a sprite that is pasted from then on.
    def draw(self, position, length=1, is_next=False, is_pred=False):
+      # the lower left corner of the tile
+      x, y = position.x - length / 2, position.y - length / 2
+      size = stddraw.regionSize(x, y, length, length)
+      key = (self.number, is_next, is_pred, size)
+      sprite = Tile.sprites.get(key)
+      if sprite is not None:
+         stddraw.pasteRegion(sprite, x, y)
+         # leave the pen and the font as they are after drawing the tile
+         stddraw.setPenColor(self.foreground_color)
+         stddraw.setFontFamily(Tile.font_family)
+         stddraw.setFontSize(self.font_size - 3 if is_next else self.font_size)
+         stddraw.setPenRadius()
+         return
+
       # draw the tile as a filled square
       if is_pred:
          stddraw.setPenColor(color.DARK_GRAY)
@@ -67,4 +89,18 @@ class Tile:
          stddraw.setFontSize(self.font_size)
       
       stddraw.text(position.x, position.y, str(self.number))
-      stddraw.setPenRadius()  # reset the pen radius to its default value
\ No newline at end of file
+      stddraw.setPenRadius()  # reset the pen radius to its default value
+
+      # capture the drawn tile as a sprite when it is entirely on the canvas
+      sprite = stddraw.captureRegion(x, y, length, length)
+      if sprite.get_size() == size:
+         Tile.sprites[key] = sprite
+
+# A function that returns the log2 exponent of a given tile number, which is
+# used for storing the tiles compactly on the game grid (0 is used for empty)
+def number_to_exponent(number):
+   return int(number).bit_length() - 1
+
+# A function that returns the tile number for a given log2 exponent
+def exponent_to_number(exponent):
+   return 1 << int(exponent)
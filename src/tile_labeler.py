@@ -0,0 +1,67 @@
+import numpy as np  # fundamental Python module for scientific computing
+
+# A class for labeling the tiles of a game grid board that are connected to the
+# bottom row (through their left, right, upper and lower neighbors) so that the
+# other (free) tiles can be removed. The occupied cells are packed into a
+# Python integer used as a bitboard in which each row takes grid_w + 1 bits;
+# the extra (always empty) bit of each row keeps the flood fill from wrapping
+# around from one end of a row to the other. A labeler is reused for all the
+# boards of the same size and keeps the labels of the previous call.
+class TileLabeler:
+   # A constructor for creating a labeler for boards with the given dimensions
+   def __init__(self, grid_h, grid_w):
+      self.grid_height = grid_h
+      self.grid_width = grid_w
+      # the number of bits used for each row of the bitboards
+      self.stride = grid_w + 1
+      # the bits of the cells in the bottom row
+      self.bottom_row = (1 << grid_w) - 1
+      # the buffer used for packing the occupied cells into a bitboard
+      self._occupied = np.zeros((grid_h, self.stride), dtype=bool)
+      # the tiles that were connected to the bottom row in the previous call
+      self._supported = 0
+
+   # A method that returns the occupied cells of the given board as a bitboard
+   def get_occupied(self, board):
+      np.not_equal(board, 0, out=self._occupied[:, :self.grid_width])
+      packed = np.packbits(self._occupied, bitorder='little')
+      return int.from_bytes(packed.tobytes(), 'little')
+
+   # A method that returns the bitboard of the tiles connected to the bottom row
+   # for a given bitboard of the occupied cells
+   def get_supported(self, occupied):
+      reached = occupied & self.bottom_row
+      # the tiles found in the previous call are still connected to the bottom
+      # row when none of them is removed (e.g. when a tetromino is locked),
+      # so the flood fill only has to visit the newly added tiles
+      if self._supported & ~occupied == 0:
+         reached |= self._supported
+      # flood fill the occupied cells from the reached tiles
+      stride = self.stride
+      frontier = reached
+      while frontier:
+         neighbors = (frontier << 1) | (frontier >> 1) | (frontier << stride) \
+            | (frontier >> stride)
+         frontier = neighbors & occupied & ~reached
+         reached |= frontier
+      self._supported = reached
+      return reached
+
+   # A method that removes the free tiles (not connected to the bottom row)
+   # from the given board (in place). Returns the sum of the removed tile
+   # numbers and a mask of the cells the tiles are removed from.
+   def remove_free_tiles(self, board):
+      occupied = self.get_occupied(board)
+      free = occupied & ~self.get_supported(occupied)
+      freed_mask = np.zeros(board.shape, dtype=bool)
+      gained = 0
+      # visit the set bits of the free tiles one by one
+      while free:
+         lowest = free & -free
+         row, col = divmod(lowest.bit_length() - 1, self.stride)
+         gained += 1 << int(board[row, col])
+         board[row, col] = 0
+         freed_mask[row, col] = True
+         free ^= lowest
+      # the remaining tiles are exactly the supported ones
+      return gained, freed_mask
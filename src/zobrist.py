@@ -0,0 +1,69 @@
+import os  # the os module is used for reading the environment variables
+import numpy as np  # fundamental Python module for scientific computing
+
+# the seed of the random keys (fixed so that the hashes of the same boards are
+# the same in all the processes and runs, e.g. for comparing replays)
+SEED = 2048
+# the number of the tile values (the log2 exponents stored in the uint8 boards)
+N_VALUES = 256
+# the environment variable that enables the verification of the incremental
+# hashes (and the row and column masks of the game grids) against the ones
+# computed from scratch (when it is set to 1)
+VERIFY_ENV = "TETRIS_VERIFY_HASH"
+
+# A class for computing 64-bit Zobrist hashes of the boards with the given
+# dimensions: each (cell, tile value) pair has a random 64-bit key and the hash
+# of a board is the XOR of the keys of its cells and their values. The keys of
+# the empty cells are 0, so the hash of the empty board is 0. As XOR is its own
+# inverse, the hash is updated by XOR-ing out the old keys and XOR-ing in the
+# new keys of only the changed cells (given by the caller when it knows them,
+# e.g. the cells of a locked tetromino, or found by comparing the boards).
+class ZobristTable:
+   # A constructor for creating the keys of the boards with the given
+   # dimensions from the given seed
+   def __init__(self, grid_h, grid_w, seed=SEED):
+      rng = np.random.default_rng(seed)
+      self.keys = rng.integers(0, 2**64, size=(grid_h, grid_w, N_VALUES),
+                               dtype=np.uint64)
+      self.keys[:, :, 0] = 0  # the empty cells do not change the hash
+      # the keys as nested lists of Python integers (keys[row][col][value])
+      # for updating the hash for a few cells without any array indexing
+      self.key_lists = self.keys.tolist()
+
+   # A method that returns the hash of the given board computed from scratch
+   def hash(self, board):
+      rows, cols = np.indices(board.shape)
+      return int(np.bitwise_xor.reduce(self.keys[rows, cols, board], axis=None))
+
+   # A method that returns the hash of a board from the given hash after the
+   # tiles with the given values (exponents) are placed on the empty cells
+   # with the given rows and columns, or removed from them
+   def toggle(self, board_hash, rows, cols, values):
+      key_lists = self.key_lists
+      for row, col, value in zip(rows, cols, values):
+         board_hash ^= key_lists[row][col][value]
+      return board_hash
+
+   # A method that returns the hash of the given new board from the given hash
+   # of the given old board by updating it for the cells that are different
+   # (found by comparing the boards, for the changes moving many tiles)
+   def update(self, board_hash, old_board, new_board):
+      rows, cols = np.nonzero(old_board != new_board)
+      if len(rows) == 0:
+         return board_hash
+      changes = (self.keys[rows, cols, old_board[rows, cols]]
+                 ^ self.keys[rows, cols, new_board[rows, cols]])
+      return board_hash ^ int(np.bitwise_xor.reduce(changes))
+
+# the tables shared by all the boards with the same dimensions
+_tables = {}
+
+# A function that returns the table of the boards with the given dimensions
+def get_zobrist_table(grid_h, grid_w):
+   if (grid_h, grid_w) not in _tables:
+      _tables[grid_h, grid_w] = ZobristTable(grid_h, grid_w)
+   return _tables[grid_h, grid_w]
+
+# A function that returns whether the incremental hashes are verified
+def verify_enabled():
+   return os.environ.get(VERIFY_ENV, "") not in ("", "0")